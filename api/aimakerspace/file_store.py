@@ -0,0 +1,136 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, List, Optional
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+CACHE_DIR_NAME = ".precompressed"
+BLOCK_SIZE = 1024 * 1024
+# Brotli's best quality is slow; use it only where it stays cheap
+BROTLI_MAX_QUALITY_SIZE = 4 * 1024 * 1024
+
+# Preferred first when the client accepts several
+ENCODINGS = ("br", "gzip")
+_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def _cache_path(path: str, suffix: str) -> str:
+    directory, name = os.path.split(path)
+    return os.path.join(directory, CACHE_DIR_NAME, name + suffix)
+
+
+def encoded_path(path: str, encoding: str) -> str:
+    return _cache_path(path, _SUFFIXES[encoding])
+
+
+def _write_atomically(target: str, write) -> None:
+    # Concurrent requests may rebuild the same file; never expose a partial one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+    try:
+        with os.fdopen(fd, "wb") as out:
+            write(out)
+        os.replace(tmp_path, target)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _compress(path: str, encoding: str, out) -> None:
+    with open(path, "rb") as src:
+        if encoding == "gzip":
+            # mtime=0 keeps the output identical for identical input
+            with gzip.GzipFile(fileobj=out, mode="wb", mtime=0) as gz:
+                while block := src.read(BLOCK_SIZE):
+                    gz.write(block)
+        else:
+            size = os.fstat(src.fileno()).st_size
+            quality = 11 if size <= BROTLI_MAX_QUALITY_SIZE else 6
+            compressor = brotli.Compressor(quality=quality)
+            while block := src.read(BLOCK_SIZE):
+                out.write(compressor.process(block))
+            out.write(compressor.finish())
+
+
+def precompress(path: str) -> Dict[str, Any]:
+    """Hash ``path`` and store compressed copies next to it.
+
+    Writes ``.precompressed/<name>.gz`` (and ``.br`` when brotli is installed)
+    plus a ``.json`` record of the content hash, size and mtime. Encodings that
+    do not make the file smaller are skipped. Returns the record.
+    """
+    os.makedirs(os.path.dirname(_cache_path(path, "")), exist_ok=True)
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as src:
+        while block := src.read(BLOCK_SIZE):
+            sha256.update(block)
+    stat = os.stat(path)
+
+    encodings: List[str] = []
+    for encoding in ENCODINGS:
+        if encoding == "br" and brotli is None:
+            continue
+        target = encoded_path(path, encoding)
+        _write_atomically(
+            target, lambda out, encoding=encoding: _compress(path, encoding, out)
+        )
+        if os.path.getsize(target) < stat.st_size:
+            encodings.append(encoding)
+        else:
+            os.unlink(target)
+
+    meta = {
+        "sha256": sha256.hexdigest(),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "mtime_ns": stat.st_mtime_ns,
+        "encodings": encodings,
+    }
+    _write_atomically(
+        _cache_path(path, ".json"), lambda out: out.write(json.dumps(meta).encode())
+    )
+    return meta
+
+
+def file_meta(path: str) -> Dict[str, Any]:
+    """Return the stored record for ``path``, rebuilding it if stale or missing."""
+    stat = os.stat(path)
+    try:
+        with open(_cache_path(path, ".json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns:
+            return meta
+    except (OSError, ValueError, KeyError):
+        pass
+    return precompress(path)
+
+
+def choose_encoding(accept_encoding: str, available: List[str]) -> Optional[str]:
+    """Pick the best stored encoding the client accepts (ignoring q=0)."""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip())
+    for encoding in ENCODINGS:
+        if encoding in available and (encoding in accepted or "*" in accepted):
+            return encoding
+    return None
+
+
+def etag_matches(if_none_match: str, sha256: str) -> bool:
+    """Check If-None-Match against any representation of the content."""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        tag = tag.removeprefix("W/").strip('"')
+        if tag.split("-", 1)[0] == sha256:
+            return True
+    return False
@@ -0,0 +1,218 @@
+import math
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from xml.etree import ElementTree
+
+# Same constants as gpxpy.geo so distances match gpxpy's length_3d()
+EARTH_RADIUS = 6378.137 * 1000
+ONE_DEGREE = (2 * math.pi * EARTH_RADIUS) / 360
+
+NAN = float("nan")
+
+_DETACHED_TAGS = ("trkpt", "trkseg", "trk", "wpt", "rte")
+
+
+class GPXStreamError(Exception):
+    """Raised when a file needs the full gpxpy parser."""
+
+
+def _float_array() -> array:
+    return array("d")
+
+
+@dataclass
+class TrackSegment:
+    """Track points stored column-wise in compact float arrays.
+
+    Missing elevations and times are stored as NaN; times are POSIX seconds.
+    """
+
+    latitudes: array = field(default_factory=_float_array)
+    longitudes: array = field(default_factory=_float_array)
+    elevations: array = field(default_factory=_float_array)
+    times: array = field(default_factory=_float_array)
+
+    def __len__(self) -> int:
+        return len(self.latitudes)
+
+    def append(self, lat: float, lon: float, ele: float, time: float) -> None:
+        self.latitudes.append(lat)
+        self.longitudes.append(lon)
+        self.elevations.append(ele)
+        self.times.append(time)
+
+    def start(self) -> Optional[Tuple[float, float]]:
+        if not self:
+            return None
+        return self.latitudes[0], self.longitudes[0]
+
+    def end(self) -> Optional[Tuple[float, float]]:
+        if not self:
+            return None
+        return self.latitudes[-1], self.longitudes[-1]
+
+    def bounds(self) -> Optional[Tuple[float, float, float, float]]:
+        """Return (min_lat, min_lon, max_lat, max_lon)."""
+        if not self:
+            return None
+        return (
+            min(self.latitudes),
+            min(self.longitudes),
+            max(self.latitudes),
+            max(self.longitudes),
+        )
+
+    def length_3d(self) -> float:
+        """Return the length in meters, computed the same way as gpxpy does."""
+        import numpy as np
+
+        if len(self) < 2:
+            return 0.0
+        lat = np.frombuffer(self.latitudes)
+        lon = np.frombuffer(self.longitudes)
+        ele = np.frombuffer(self.elevations)
+        # gpxpy measures from each point to the previous one
+        lat1, lat2 = lat[1:], lat[:-1]
+        lon1, lon2 = lon[1:], lon[:-1]
+
+        x = lat1 - lat2
+        y = (lon1 - lon2) * np.cos(np.radians(lat1))
+        flat = np.sqrt(x * x + y * y) * ONE_DEGREE
+        d_ele = ele[1:] - ele[:-1]
+        with_ele = np.where(np.isnan(d_ele), flat, np.sqrt(flat**2 + d_ele**2))
+
+        # Far apart points use the haversine distance, ignoring elevation
+        sin_lat = np.sin(np.radians(lat1 - lat2) / 2)
+        sin_lon = np.sin(np.radians(lon1 - lon2) / 2)
+        cos_lats = np.cos(np.radians(lat1)) * np.cos(np.radians(lat2))
+        a = sin_lat**2 + sin_lon**2 * cos_lats
+        haversine = EARTH_RADIUS * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+        far = (np.abs(x) > 0.2) | (np.abs(lon1 - lon2) > 0.2)
+        return float(np.where(far, haversine, with_ele).sum())
+
+    def elevation_gain(self) -> float:
+        import numpy as np
+
+        d_ele = np.diff(np.frombuffer(self.elevations))
+        return float(d_ele[d_ele > 0].sum())
+
+
+@dataclass
+class Track:
+    name: Optional[str] = None
+    segments: List[TrackSegment] = field(default_factory=list)
+
+
+@lru_cache(maxsize=256)
+def _local_name(tag: str) -> str:
+    # Drop the "{namespace}" prefix so GPX 1.0 and 1.1 files parse alike
+    return tag.rsplit("}", 1)[-1]
+
+
+def _parse_time(text: Optional[str]) -> float:
+    if not text:
+        return NAN
+    try:
+        moment = datetime.fromisoformat(text.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return NAN
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def iterparse_tracks(path: str) -> List[Track]:
+    """Stream the tracks of a GPX file without building a full object tree.
+
+    Each ``trkpt`` is appended to its segment's arrays and detached from the
+    tree as soon as it ends, so memory stays proportional to the coordinates.
+    Raises ``GPXStreamError`` for anything that needs gpxpy instead.
+    """
+    tracks: List[Track] = []
+    stack: List[ElementTree.Element] = []
+    track: Optional[Track] = None
+    segment: Optional[TrackSegment] = None
+    try:
+        for event, elem in ElementTree.iterparse(path, events=("start", "end")):
+            tag = _local_name(elem.tag)
+            if event == "start":
+                if not stack and tag != "gpx":
+                    raise GPXStreamError(f"Unexpected root element <{tag}>")
+                if tag == "trk":
+                    track = Track()
+                    tracks.append(track)
+                elif tag == "trkseg":
+                    if track is None:
+                        raise GPXStreamError("<trkseg> outside of <trk>")
+                    segment = TrackSegment()
+                    track.segments.append(segment)
+                stack.append(elem)
+                continue
+
+            stack.pop()
+            parent = stack[-1] if stack else None
+            if tag == "trkpt":
+                if segment is None:
+                    raise GPXStreamError("<trkpt> outside of <trkseg>")
+                ele, time = NAN, NAN
+                for child in elem:
+                    child_tag = _local_name(child.tag)
+                    if child_tag == "ele" and child.text and child.text.strip():
+                        ele = float(child.text)
+                    elif child_tag == "time":
+                        time = _parse_time(child.text)
+                lat, lon = elem.get("lat"), elem.get("lon")
+                if lat is None or lon is None:
+                    raise GPXStreamError("<trkpt> without lat/lon")
+                segment.append(float(lat), float(lon), ele, time)
+            elif tag == "name" and track is not None and parent is not None:
+                if _local_name(parent.tag) == "trk":
+                    track.name = (elem.text or "").strip() or None
+            elif tag == "trkseg":
+                segment = None
+            elif tag == "trk":
+                track = None
+
+            # Detach finished subtrees we no longer need from the tree
+            if parent is not None and tag in _DETACHED_TAGS:
+                parent.remove(elem)
+    except ValueError as e:
+        raise GPXStreamError(f"Unsupported track point: {e}") from e
+    return tracks
+
+
+def _tracks_from_gpxpy(path: str) -> List[Track]:
+    import gpxpy
+
+    with open(path) as gpx_file:
+        gpx = gpxpy.parse(gpx_file)
+
+    tracks = []
+    for gpx_track in gpx.tracks:
+        track = Track(name=gpx_track.name)
+        for gpx_segment in gpx_track.segments:
+            segment = TrackSegment()
+            for point in gpx_segment.points:
+                segment.append(
+                    point.latitude,
+                    point.longitude,
+                    NAN if point.elevation is None else point.elevation,
+                    point.time.timestamp() if point.time else NAN,
+                )
+            track.segments.append(segment)
+        tracks.append(track)
+    return tracks
+
+
+def load_gpx_tracks(path: str) -> List[Track]:
+    """Parse the tracks of a GPX file, streaming when possible.
+
+    Files the streaming parser cannot handle fall back to gpxpy.
+    """
+    try:
+        return iterparse_tracks(path)
+    except (GPXStreamError, ElementTree.ParseError):
+        return _tracks_from_gpxpy(path)
@@ -0,0 +1,272 @@
+"""Bulk-ingest a directory of .txt and .pdf files into the vector database.
+
+Files are parsed and chunked in worker processes, embedded in batches while
+later files are still being parsed, and upserted one batch per request. Every
+fully stored file is appended to a checkpoint so an interrupted run resumes
+where it stopped. Files that cannot be parsed are logged, listed next to the
+checkpoint and retried on the next run; they do not stop the others.
+
+Usage (from the ``api`` directory):
+    python -m aimakerspace.ingest path/to/docs --checkpoint ingest.ckpt
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import (
+    AsyncIterator,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    TextIO,
+    Tuple,
+)
+
+from aimakerspace.pipeline import Chunk, astore_chunks
+from aimakerspace.text_utils import CharacterTextSplitter, PDFLoader, TextFileLoader
+from aimakerspace.vectordatabase import VectorDatabase
+
+logger = logging.getLogger(__name__)
+
+
+def iter_source_paths(directory: str) -> Iterator[str]:
+    yield from TextFileLoader(directory).iter_paths()
+    yield from PDFLoader(directory).iter_paths()
+
+
+def parse_file(path: str, chunk_size: int, chunk_overlap: int) -> Tuple[str, List[str]]:
+    """Extract and chunk a single file. Runs in a worker process."""
+    if path.lower().endswith(".pdf"):
+        text = PDFLoader.extract_text(path)
+    else:
+        loader = TextFileLoader(path)
+        loader.load_file()
+        text = loader.documents[0]
+    splitter = CharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return path, [chunk for chunk in splitter.split(text) if chunk.strip()]
+
+
+class Checkpoint:
+    """Append-only record of files whose chunks are all stored.
+
+    Files that failed to parse are listed, with the error, in a ``.failed``
+    file next to the checkpoint. That list is rewritten on every run, and its
+    files are not marked done, so a rerun retries them.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.failed_path = path + ".failed" if path else None
+        self.done: Set[str] = set()
+        self.failed: Dict[str, str] = {}
+        self._file: Optional[TextIO] = None
+        self._failed_file: Optional[TextIO] = None
+        if path:
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    self.done = {line.rstrip("\n") for line in f if line.strip()}
+            self._file = open(path, "a", encoding="utf-8")
+            if os.path.exists(path + ".failed"):
+                # Only the latest run's failures are listed
+                os.remove(path + ".failed")
+
+    def __contains__(self, file_name: str) -> bool:
+        return file_name in self.done
+
+    def mark_done(self, file_name: str) -> None:
+        self.done.add(file_name)
+        if self._file:
+            self._file.write(file_name + "\n")
+            self._file.flush()
+
+    def mark_failed(self, file_name: str, error: str) -> None:
+        self.failed[file_name] = error
+        if self.failed_path:
+            if self._failed_file is None:
+                self._failed_file = open(self.failed_path, "w", encoding="utf-8")
+            self._failed_file.write(f"{file_name}\t{error}\n")
+            self._failed_file.flush()
+
+    def close(self) -> None:
+        for f in (self._file, self._failed_file):
+            if f:
+                f.close()
+        self._file = self._failed_file = None
+
+
+class Progress:
+    """Single-line progress and throughput display."""
+
+    def __init__(
+        self, total_files: int, skipped_files: int = 0, stream: TextIO = sys.stderr
+    ):
+        self.total_files = total_files
+        self.skipped_files = skipped_files
+        self.files_done = 0
+        self.files_failed = 0
+        self.chunks_done = 0
+        self.stream = stream
+        self._start = time.monotonic()
+        self._last_render = 0.0
+
+    def update(self, files: int = 0, chunks: int = 0, failed: int = 0) -> None:
+        self.files_done += files
+        self.files_failed += failed
+        self.chunks_done += chunks
+        if time.monotonic() - self._last_render >= 0.5:
+            self.render()
+
+    def render(self, final: bool = False) -> None:
+        self._last_render = time.monotonic()
+        elapsed = max(self._last_render - self._start, 1e-9)
+        line = (
+            f"\r{self.files_done}/{self.total_files} files"
+            f" ({self.skipped_files} already done, {self.files_failed} failed)"
+            f" | {self.chunks_done} chunks"
+            f" | {self.files_done / elapsed:.1f} files/s"
+            f" | {self.chunks_done / elapsed:.1f} chunks/s"
+            f" | {elapsed:.0f}s"
+        )
+        self.stream.write(line + ("\n" if final else ""))
+        self.stream.flush()
+
+
+async def ingest_directory(
+    directory: str,
+    vector_db: VectorDatabase,
+    checkpoint: Checkpoint,
+    workers: int = 4,
+    batch_size: int = 64,
+    embed_concurrency: int = 4,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    progress_stream: TextIO = sys.stderr,
+) -> Progress:
+    loop = asyncio.get_running_loop()
+    all_paths = list(iter_source_paths(directory))
+    paths = [p for p in all_paths if os.path.relpath(p, directory) not in checkpoint]
+    progress = Progress(len(paths), len(all_paths) - len(paths), progress_stream)
+    remaining_chunks: Dict[str, int] = {}
+
+    def finish_file(file_name: str) -> None:
+        checkpoint.mark_done(file_name)
+        progress.update(files=1)
+
+    async def parsed_chunks(pool: ProcessPoolExecutor) -> AsyncIterator[Chunk]:
+        # Only a few files are parsed ahead of the one being batched
+        pending: Deque[Tuple[str, asyncio.Future]] = deque()
+        path_iter = iter(paths)
+        while True:
+            for path in islice(path_iter, workers * 2 - len(pending)):
+                future = loop.run_in_executor(
+                    pool, parse_file, path, chunk_size, chunk_overlap
+                )
+                pending.append((path, future))
+            if not pending:
+                return
+            path, future = pending.popleft()
+            file_name = os.path.relpath(path, directory)
+            try:
+                _, chunks = await future
+            except Exception as e:
+                # One unreadable file (e.g. a corrupt PDF) must not stop the run
+                logger.warning(f"Skipping {file_name}: {e!r}")
+                checkpoint.mark_failed(file_name, repr(e))
+                progress.update(failed=1)
+                continue
+            if not chunks:
+                finish_file(file_name)
+                continue
+            remaining_chunks[file_name] = len(chunks)
+            for index, chunk in enumerate(chunks):
+                yield file_name, index, chunk
+
+    def on_stored(batch: List[Chunk]) -> None:
+        progress.update(chunks=len(batch))
+        for file_name, _, _ in batch:
+            remaining_chunks[file_name] -= 1
+            if remaining_chunks[file_name] == 0:
+                del remaining_chunks[file_name]
+                finish_file(file_name)
+
+    # Forking while asyncio's worker threads run can deadlock the children
+    pool = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+    try:
+        await astore_chunks(
+            parsed_chunks(pool),
+            vector_db,
+            batch_size=batch_size,
+            max_pending_batches=embed_concurrency * 2,
+            embed_concurrency=embed_concurrency,
+            on_stored=on_stored,
+        )
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        progress.render(final=True)
+    return progress
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Bulk-ingest .txt and .pdf files into the vector database."
+    )
+    parser.add_argument("directory", help="Directory to ingest recursively")
+    parser.add_argument("--collection", default="default")
+    parser.add_argument(
+        "--checkpoint",
+        help="File recording ingested files; rerun with it to resume",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--embed-concurrency", type=int, default=4)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"{args.directory} is not a directory")
+
+    checkpoint = Checkpoint(args.checkpoint)
+    try:
+        progress = asyncio.run(
+            ingest_directory(
+                args.directory,
+                VectorDatabase(collection_name=args.collection),
+                checkpoint,
+                workers=args.workers,
+                batch_size=args.batch_size,
+                embed_concurrency=args.embed_concurrency,
+                chunk_size=args.chunk_size,
+                chunk_overlap=args.chunk_overlap,
+            )
+        )
+    except KeyboardInterrupt:
+        if args.checkpoint:
+            print(f"Interrupted; rerun with --checkpoint {args.checkpoint} to resume.")
+        sys.exit(130)
+    except Exception as e:
+        resume = f"; rerun with --checkpoint {args.checkpoint} to resume"
+        sys.exit(f"Ingestion stopped: {e}{resume if args.checkpoint else ''}")
+    finally:
+        checkpoint.close()
+
+    if progress.files_failed:
+        where = f", listed in {checkpoint.failed_path}" if args.checkpoint else ""
+        print(f"{progress.files_failed} file(s) could not be parsed{where}.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 import os
 
+from aimakerspace.openai_utils.ratelimit import estimate_tokens, get_rate_limiter
 from dotenv import load_dotenv
 from openai import AsyncOpenAI, OpenAI
 
 load_dotenv()
 
 
+def _estimate_message_tokens(messages) -> int:
+    return estimate_tokens([str(m.get("content", "")) for m in messages])
+
+
 class ChatOpenAI:
     def __init__(self, model_name: str = "gpt-4o-mini"):
         self.model_name = model_name
@@ -17,9 +22,12 @@ class ChatOpenAI:
         if not isinstance(messages, list):
             raise ValueError("messages must be a list")
 
-        client = OpenAI()
-        response = client.chat.completions.create(
-            model=self.model_name, messages=messages, **kwargs
+        client = OpenAI(max_retries=0)
+        response = get_rate_limiter(self.openai_api_key, self.model_name).call(
+            lambda: client.chat.completions.with_raw_response.create(
+                model=self.model_name, messages=messages, **kwargs
+            ),
+            tokens=_estimate_message_tokens(messages),
         )
 
         if text_only:
@@ -31,10 +39,13 @@ class ChatOpenAI:
         if not isinstance(messages, list):
             raise ValueError("messages must be a list")
 
-        client = AsyncOpenAI()
+        client = AsyncOpenAI(max_retries=0)
 
-        stream = await client.chat.completions.create(
-            model=self.model_name, messages=messages, stream=True, **kwargs
+        stream = await get_rate_limiter(self.openai_api_key, self.model_name).acall(
+            lambda: client.chat.completions.with_raw_response.create(
+                model=self.model_name, messages=messages, stream=True, **kwargs
+            ),
+            tokens=_estimate_message_tokens(messages),
         )
 
         async for chunk in stream:
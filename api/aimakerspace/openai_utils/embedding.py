@@ -2,50 +2,90 @@ import asyncio
 import os
 from typing import List
 
-import openai
+from aimakerspace.openai_utils.ratelimit import estimate_tokens, get_rate_limiter
+from aimakerspace.singleflight import SingleFlight
 from dotenv import load_dotenv
-from openai import AsyncOpenAI, OpenAI
+
+load_dotenv()
+
+# Shared by all instances so concurrent requests for the same text coalesce
+embedding_flights = SingleFlight()
 
 
 class EmbeddingModel:
     def __init__(self, embeddings_model_name: str = "text-embedding-3-small"):
-        load_dotenv()
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        self.async_client = AsyncOpenAI()
-        self.client = OpenAI()
-
         if self.openai_api_key is None:
             raise ValueError(
                 "OPENAI_API_KEY environment variable is not set."
                 "Please set it to your OpenAI API key."
             )
-        openai.api_key = self.openai_api_key
         self.embeddings_model_name = embeddings_model_name
+        self.rate_limiter = get_rate_limiter(
+            self.openai_api_key, self.embeddings_model_name
+        )
+        # Clients are created on first use so importing/constructing is cheap
+        self._async_client = None
+        self._client = None
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+
+            self._async_client = AsyncOpenAI(api_key=self.openai_api_key, max_retries=0)
+        return self._async_client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+
+            self._client = OpenAI(api_key=self.openai_api_key, max_retries=0)
+        return self._client
 
     async def async_get_embeddings(self, list_of_text: List[str]) -> List[List[float]]:
-        embedding_response = await self.async_client.embeddings.create(
-            input=list_of_text, model=self.embeddings_model_name
+        embedding_response = await self.rate_limiter.acall(
+            lambda: self.async_client.embeddings.with_raw_response.create(
+                input=list_of_text, model=self.embeddings_model_name
+            ),
+            tokens=estimate_tokens(list_of_text),
         )
 
         return [embeddings.embedding for embeddings in embedding_response.data]
 
     async def async_get_embedding(self, text: str) -> List[float]:
-        embedding = await self.async_client.embeddings.create(
-            input=text, model=self.embeddings_model_name
+        return await embedding_flights.do(
+            (self.embeddings_model_name, text),
+            lambda: self._async_get_embedding(text),
+        )
+
+    async def _async_get_embedding(self, text: str) -> List[float]:
+        embedding = await self.rate_limiter.acall(
+            lambda: self.async_client.embeddings.with_raw_response.create(
+                input=text, model=self.embeddings_model_name
+            ),
+            tokens=estimate_tokens([text]),
         )
 
         return embedding.data[0].embedding
 
     def get_embeddings(self, list_of_text: List[str]) -> List[List[float]]:
-        embedding_response = self.client.embeddings.create(
-            input=list_of_text, model=self.embeddings_model_name
+        embedding_response = self.rate_limiter.call(
+            lambda: self.client.embeddings.with_raw_response.create(
+                input=list_of_text, model=self.embeddings_model_name
+            ),
+            tokens=estimate_tokens(list_of_text),
         )
 
         return [embeddings.embedding for embeddings in embedding_response.data]
 
     def get_embedding(self, text: str) -> List[float]:
-        embedding = self.client.embeddings.create(
-            input=text, model=self.embeddings_model_name
+        embedding = self.rate_limiter.call(
+            lambda: self.client.embeddings.with_raw_response.create(
+                input=text, model=self.embeddings_model_name
+            ),
+            tokens=estimate_tokens([text]),
         )
 
         return embedding.data[0].embedding
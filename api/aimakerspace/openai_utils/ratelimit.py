@@ -0,0 +1,410 @@
+import asyncio
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Deque, List, Mapping, Optional, Tuple
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call is still throttled once its retry budget is spent."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ConcurrencyTimeout(Exception):
+    """Raised when a call waits too long for a local concurrency slot.
+
+    Unlike ``RateLimitExceeded`` this does not mean OpenAI throttled anything,
+    only that this process already has as many calls in flight as it allows.
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_tokens(texts: List[str]) -> int:
+    # Roughly four characters per token for English text
+    return sum(len(text) for text in texts) // 4 + 1
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse OpenAI reset durations such as ``"1s"``, ``"6m0s"`` or ``"20ms"``."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def retry_after_from_headers(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    return parse_duration(headers.get("retry-after"))
+
+
+class TokenBucket:
+    """Refills continuously up to ``capacity`` units per minute.
+
+    A bucket without capacity never limits; it starts limiting once
+    ``sync`` learns the real limit from response headers.
+    """
+
+    def __init__(self, per_minute: Optional[float] = None):
+        self.capacity = per_minute
+        self.level = per_minute or 0.0
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if self.capacity is not None:
+            elapsed = max(0.0, now - self._updated)
+            self.level = min(self.capacity, self.level + elapsed * self.capacity / 60)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        if self.capacity is None:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / self.capacity
+
+    def take(self, amount: float, now: float) -> None:
+        if self.capacity is not None:
+            self._refill(now)
+            self.level -= min(amount, self.capacity)
+
+    def sync(
+        self, limit: Optional[float], remaining: Optional[float], now: float
+    ) -> None:
+        self._refill(now)
+        if limit:
+            if self.capacity is None:
+                self.level = limit
+            self.capacity = limit
+        if remaining is not None and self.capacity is not None:
+            self.level = min(self.level, remaining)
+
+
+class _SlotWaiter:
+    """A caller queued for a concurrency slot; async callers await ``future``."""
+
+    def __init__(self, future: Optional[asyncio.Future] = None):
+        self.granted = False
+        self.future = future
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class RateLimitController:
+    """Client-side pacing, adaptive concurrency and retries for OpenAI calls.
+
+    Requests and tokens are limited by token buckets that follow the
+    ``x-ratelimit-*`` response headers. Concurrency grows additively after each
+    success and is halved after a 429 (AIMD); callers beyond it wait in a FIFO
+    queue and are handed slots as calls finish. Throttled and transient
+    failures are retried with jittered exponential backoff until ``deadline``
+    seconds have passed, after which ``RateLimitExceeded`` is raised. A call
+    still queued for a slot at its deadline raises ``ConcurrencyTimeout``.
+
+    The wrapped callables must return a raw response (``with_raw_response``)
+    so the headers can be read; the parsed response is returned.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        initial_concurrency: int = 4,
+        max_concurrency: int = 64,
+        max_retries: int = 8,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        deadline: float = 60.0,
+        safety_factor: float = 0.95,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.concurrency = float(initial_concurrency)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        # Stay slightly below the advertised limits so bursts do not hit them
+        self.safety_factor = safety_factor
+        self.stats = {"calls": 0, "throttled": 0, "retries": 0, "queue_timeouts": 0}
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._slot_granted = threading.Condition(self._lock)
+        self._waiters: Deque[_SlotWaiter] = deque()
+
+    def call(
+        self, fn: Callable[[], Any], tokens: int = 0, deadline: Optional[float] = None
+    ) -> Any:
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            self._acquire_slot(deadline_at)
+            try:
+                while (wait := self._reserve(tokens, deadline_at)) > 0:
+                    time.sleep(wait)
+                response = fn()
+            except Exception as error:
+                self._release()
+                time.sleep(self._retry_delay(error, attempt, deadline_at))
+                attempt += 1
+                continue
+            self._release()
+            return self._on_response(response)
+
+    async def acall(
+        self,
+        fn: Callable[[], Awaitable[Any]],
+        tokens: int = 0,
+        deadline: Optional[float] = None,
+    ) -> Any:
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            await self._aacquire_slot(deadline_at)
+            try:
+                while (wait := self._reserve(tokens, deadline_at)) > 0:
+                    await asyncio.sleep(wait)
+                response = await fn()
+            except Exception as error:
+                self._release()
+                await asyncio.sleep(self._retry_delay(error, attempt, deadline_at))
+                attempt += 1
+                continue
+            self._release()
+            return self._on_response(response)
+
+    def _try_acquire(self) -> bool:
+        # Caller holds the lock; queued callers go first
+        if not self._waiters and self._in_flight < int(self.concurrency):
+            self._in_flight += 1
+            return True
+        return False
+
+    def _grant_waiters(self) -> None:
+        # Caller holds the lock; hand free slots to waiters in arrival order
+        notify = False
+        while self._waiters and self._in_flight < int(self.concurrency):
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self._in_flight += 1
+            if waiter.future is not None:
+                waiter.future.get_loop().call_soon_threadsafe(_resolve, waiter.future)
+            else:
+                notify = True
+        if notify:
+            self._slot_granted.notify_all()
+
+    def _queue_timeout(self) -> ConcurrencyTimeout:
+        self.stats["queue_timeouts"] += 1
+        return ConcurrencyTimeout(
+            "Too many OpenAI calls in flight; try again later.", self.base_delay
+        )
+
+    def _acquire_slot(self, deadline_at: float) -> None:
+        with self._lock:
+            if self._try_acquire():
+                return
+            waiter = _SlotWaiter()
+            self._waiters.append(waiter)
+            while not waiter.granted:
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    self._waiters.remove(waiter)
+                    raise self._queue_timeout()
+                self._slot_granted.wait(remaining)
+
+    async def _aacquire_slot(self, deadline_at: float) -> None:
+        with self._lock:
+            if self._try_acquire():
+                return
+            future = asyncio.get_running_loop().create_future()
+            waiter = _SlotWaiter(future)
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(future, deadline_at - time.monotonic())
+        except TimeoutError:
+            with self._lock:
+                if not waiter.granted:
+                    self._waiters.remove(waiter)
+                    raise self._queue_timeout() from None
+            # Granted just as the wait timed out; keep the slot
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._waiters.remove(waiter)
+            if granted:
+                self._release()
+            raise
+
+    def _reserve(self, tokens: int, deadline_at: float) -> float:
+        """Take bucket capacity for a call holding a slot, or return seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(
+                self._blocked_until - now,
+                self.requests.wait_time(1, now),
+                self.tokens.wait_time(tokens, now),
+            )
+            if wait > 0:
+                if now + wait > deadline_at:
+                    raise RateLimitExceeded(
+                        "OpenAI rate limit reached; try again later.", wait
+                    )
+                return wait
+            self.requests.take(1, now)
+            self.tokens.take(tokens, now)
+            self.stats["calls"] += 1
+            return 0.0
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._grant_waiters()
+
+    def _on_response(self, response: Any) -> Any:
+        headers = getattr(response, "headers", None)
+        with self._lock:
+            if headers:
+                self._sync_limits(headers)
+            self.concurrency = min(
+                self.max_concurrency, self.concurrency + 1 / self.concurrency
+            )
+            self._grant_waiters()
+        return response.parse() if hasattr(response, "parse") else response
+
+    def _sync_limits(self, headers: Mapping[str, str]) -> None:
+        now = time.monotonic()
+        for name, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            limit = _float_header(headers, f"x-ratelimit-limit-{name}")
+            remaining = _float_header(headers, f"x-ratelimit-remaining-{name}")
+            bucket.sync(limit and limit * self.safety_factor, remaining, now)
+            if remaining == 0:
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{name}"))
+                if reset:
+                    self._blocked_until = max(self._blocked_until, now + reset)
+
+    def _retry_delay(self, error: Exception, attempt: int, deadline_at: float) -> float:
+        classified = _classify(error)
+        if classified is None:
+            raise error
+        throttled, retry_after = classified
+        now = time.monotonic()
+        with self._lock:
+            if throttled:
+                self.stats["throttled"] += 1
+                # Halve at most once per second so one burst of 429s from
+                # concurrent calls does not collapse concurrency to the floor
+                if now - self._last_decrease >= 1.0:
+                    self.concurrency = max(1.0, self.concurrency / 2)
+                    self._last_decrease = now
+                if retry_after:
+                    self._blocked_until = max(self._blocked_until, now + retry_after)
+        # Full jitter keeps retries of concurrent callers from synchronising
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        delay = max(backoff, retry_after or 0.0)
+        if attempt >= self.max_retries or now + delay > deadline_at:
+            if throttled:
+                raise RateLimitExceeded(
+                    "OpenAI rate limit reached; try again later.", delay
+                ) from error
+            raise error
+        with self._lock:
+            self.stats["retries"] += 1
+        return delay
+
+
+def _float_header(headers: Mapping[str, str], name: str) -> Optional[float]:
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _classify(error: Exception) -> Optional[Tuple[bool, Optional[float]]]:
+    """Return (throttled, retry_after) for retryable errors, None otherwise."""
+    import openai
+
+    if isinstance(error, openai.RateLimitError):
+        if getattr(error, "code", None) == "insufficient_quota":
+            return None
+        headers = error.response.headers
+        retry_after = retry_after_from_headers(headers)
+        if retry_after is None:
+            retry_after = max(
+                parse_duration(headers.get("x-ratelimit-reset-requests")) or 0.0,
+                parse_duration(headers.get("x-ratelimit-reset-tokens")) or 0.0,
+            )
+        return True, retry_after or None
+    if isinstance(error, openai.APIConnectionError):
+        return False, None
+    if isinstance(error, openai.APIStatusError) and (
+        error.status_code in (408, 409) or error.status_code >= 500
+    ):
+        return False, retry_after_from_headers(error.response.headers)
+    return None
+
+
+_limiters_lock = threading.Lock()
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+@lru_cache(maxsize=32)
+def _rate_limiter(key_hash: str, model: str) -> RateLimitController:
+    return RateLimitController(
+        requests_per_minute=_env_float("OPENAI_RPM_LIMIT"),
+        tokens_per_minute=_env_float("OPENAI_TPM_LIMIT"),
+    )
+
+
+def get_rate_limiter(
+    api_key: Optional[str] = None, model: Optional[str] = None
+) -> RateLimitController:
+    """Return the controller shared by every call made with ``api_key`` to ``model``.
+
+    OpenAI applies (and reports) limits per model, so each model gets its own
+    controller. Limits are learned from response headers; ``OPENAI_RPM_LIMIT``
+    and ``OPENAI_TPM_LIMIT`` can seed them before the first response arrives.
+    """
+    # Only a hash of the key is kept, in a bounded cache like the API clients
+    key_hash = hashlib.sha256((api_key or "").encode()).hexdigest()
+    with _limiters_lock:
+        return _rate_limiter(key_hash, model or "")
@@ -0,0 +1,122 @@
+import asyncio
+import uuid
+from itertools import islice
+from typing import AsyncIterator, Callable, Iterator, List, Optional, Tuple
+
+from aimakerspace.vectordatabase import VectorDatabase
+
+# (file name, position of the chunk in its file, text); "" for no file name
+Chunk = Tuple[str, int, str]
+
+
+def point_id(file_name: str, index: int) -> str:
+    # Deterministic ids make re-ingesting a partially stored file idempotent
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{file_name}#{index}"))
+
+
+async def astore_chunks(
+    chunks: AsyncIterator[Chunk],
+    vector_db: VectorDatabase,
+    batch_size: int = 64,
+    max_pending_batches: int = 2,
+    embed_concurrency: int = 1,
+    on_stored: Optional[Callable[[List[Chunk]], None]] = None,
+) -> int:
+    """Embed and store chunks in batches while more chunks are still produced.
+
+    Batching, embedding (``embed_concurrency`` requests at a time) and
+    upserting run concurrently, with bounded queues between them so memory
+    holds at most a few batches. Chunks of named files get ``point_id`` ids, so
+    storing a file again after a failure overwrites its points instead of
+    duplicating them. ``on_stored`` is called with every stored batch.
+
+    Returns the number of chunks stored.
+    """
+    embed_queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending_batches)
+    upsert_queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending_batches)
+    stored = 0
+
+    async def read_batches() -> None:
+        batch: List[Chunk] = []
+        async for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                await embed_queue.put(batch)
+                batch = []
+        if batch:
+            await embed_queue.put(batch)
+        for _ in range(embed_concurrency):
+            await embed_queue.put(None)
+
+    async def embed_batches() -> None:
+        while (batch := await embed_queue.get()) is not None:
+            texts = [text for _, _, text in batch]
+            vectors = await vector_db.embedding_model.async_get_embeddings(texts)
+            await upsert_queue.put((batch, vectors))
+        await upsert_queue.put(None)
+
+    async def upsert_batches() -> None:
+        nonlocal stored
+        running = embed_concurrency
+        while running:
+            if (item := await upsert_queue.get()) is None:
+                running -= 1
+                continue
+            batch, vectors = item
+            await asyncio.to_thread(
+                vector_db.insert_many,
+                [text for _, _, text in batch],
+                vectors,
+                file_name=[file_name for file_name, _, _ in batch],
+                ids=[
+                    point_id(file_name, index) if file_name else str(uuid.uuid4())
+                    for file_name, index, _ in batch
+                ],
+            )
+            stored += len(batch)
+            if on_stored:
+                on_stored(batch)
+
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(read_batches())
+            for _ in range(embed_concurrency):
+                tg.create_task(embed_batches())
+            tg.create_task(upsert_batches())
+    except ExceptionGroup as group:
+        # Surface the stage's own error (e.g. RateLimitExceeded) to callers
+        raise group.exceptions[0]
+    return stored
+
+
+async def aingest_chunks(
+    chunks: Iterator[str],
+    vector_db: VectorDatabase,
+    file_name: Optional[str] = None,
+    batch_size: int = 64,
+    max_pending_batches: int = 2,
+) -> int:
+    """Embed and store a lazily produced stream of chunks of one file.
+
+    Chunks (and with them the underlying pages) are pulled in a worker thread
+    while earlier batches are embedded and upserted by ``astore_chunks``.
+    Whitespace-only chunks (e.g. from pages without text) are skipped.
+
+    Returns the number of chunks stored.
+    """
+    name = file_name or ""
+    numbered = (
+        (name, index, text) for index, text in enumerate(chunks) if text.strip()
+    )
+
+    async def read_chunks() -> AsyncIterator[Chunk]:
+        while batch := await asyncio.to_thread(list, islice(numbered, batch_size)):
+            for chunk in batch:
+                yield chunk
+
+    return await astore_chunks(
+        read_chunks(),
+        vector_db,
+        batch_size=batch_size,
+        max_pending_batches=max_pending_batches,
+    )
@@ -0,0 +1,274 @@
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Any, Dict, Iterable, List, Optional
+
+from aimakerspace.gpx_utils import Track, TrackSegment
+
+POSITION_COLUMNS = (
+    "start_lat",
+    "start_lon",
+    "end_lat",
+    "end_lon",
+    "min_lat",
+    "min_lon",
+    "max_lat",
+    "max_lon",
+)
+NUMERIC_COLUMNS = (
+    "track_count",
+    "segment_count",
+    "point_count",
+    "distance_km",
+    "elevation_gain_m",
+) + POSITION_COLUMNS
+COLUMNS = ("file_name", "track_names") + NUMERIC_COLUMNS + ("updated_at",)
+SORTABLE_COLUMNS = ("file_name",) + NUMERIC_COLUMNS + ("updated_at",)
+TRACK_COLUMNS = (
+    "file_name",
+    "track_index",
+    "track_name",
+    "segment_count",
+    "point_count",
+    "distance_km",
+    "elevation_gain_m",
+) + POSITION_COLUMNS
+# Stats that add up across segments and tracks
+_SUMMED_COLUMNS = ("segment_count", "point_count", "distance_km", "elevation_gain_m")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS route_stats (
+    file_name TEXT PRIMARY KEY,
+    track_names TEXT,
+    track_count INTEGER NOT NULL,
+    segment_count INTEGER NOT NULL,
+    point_count INTEGER NOT NULL,
+    distance_km REAL NOT NULL,
+    elevation_gain_m REAL NOT NULL,
+    start_lat REAL,
+    start_lon REAL,
+    end_lat REAL,
+    end_lon REAL,
+    min_lat REAL,
+    min_lon REAL,
+    max_lat REAL,
+    max_lon REAL,
+    updated_at REAL NOT NULL
+)
+"""
+
+_TRACKS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS route_tracks (
+    file_name TEXT NOT NULL,
+    track_index INTEGER NOT NULL,
+    track_name TEXT,
+    segment_count INTEGER NOT NULL,
+    point_count INTEGER NOT NULL,
+    distance_km REAL NOT NULL,
+    elevation_gain_m REAL NOT NULL,
+    start_lat REAL,
+    start_lon REAL,
+    end_lat REAL,
+    end_lon REAL,
+    min_lat REAL,
+    min_lon REAL,
+    max_lat REAL,
+    max_lon REAL,
+    PRIMARY KEY (file_name, track_index)
+)
+"""
+
+
+def _empty_stats() -> Dict[str, Any]:
+    stats: Dict[str, Any] = {column: 0 for column in _SUMMED_COLUMNS}
+    stats.update(dict.fromkeys(POSITION_COLUMNS))
+    return stats
+
+
+def _combine(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Sums add up; start, end and bounds come from the parts that have points
+    stats = _empty_stats()
+    for column in _SUMMED_COLUMNS:
+        stats[column] = sum(part[column] for part in parts)
+    located = [part for part in parts if part["start_lat"] is not None]
+    if located:
+        stats.update(
+            start_lat=located[0]["start_lat"],
+            start_lon=located[0]["start_lon"],
+            end_lat=located[-1]["end_lat"],
+            end_lon=located[-1]["end_lon"],
+            min_lat=min(part["min_lat"] for part in located),
+            min_lon=min(part["min_lon"] for part in located),
+            max_lat=max(part["max_lat"] for part in located),
+            max_lon=max(part["max_lon"] for part in located),
+        )
+    return stats
+
+
+def summarize_segment(segment: TrackSegment) -> Dict[str, Any]:
+    """Measure one segment; empty segments count as zero segments."""
+    stats = _empty_stats()
+    start, end, bounds = segment.start(), segment.end(), segment.bounds()
+    if start and end and bounds:
+        stats.update(
+            segment_count=1,
+            point_count=len(segment),
+            distance_km=segment.length_3d() / 1000,
+            elevation_gain_m=segment.elevation_gain(),
+            start_lat=start[0],
+            start_lon=start[1],
+            end_lat=end[0],
+            end_lon=end[1],
+            min_lat=bounds[0],
+            min_lon=bounds[1],
+            max_lat=bounds[2],
+            max_lon=bounds[3],
+        )
+    return stats
+
+
+def summarize_tracks(file_name: str, tracks: List[Track]) -> Dict[str, Any]:
+    """Build the stats row of a GPX file with its per-track breakdown.
+
+    Each segment is measured once; ``tracks`` holds one row per track (with
+    its ``segments``) and the file's numbers are the totals of those rows.
+    """
+    track_rows = []
+    for index, track in enumerate(tracks):
+        segments = [summarize_segment(segment) for segment in track.segments]
+        track_rows.append(
+            {
+                "file_name": file_name,
+                "track_index": index,
+                "track_name": track.name,
+                **_combine(segments),
+                "segments": segments,
+            }
+        )
+    return {
+        "file_name": file_name,
+        "track_names": ", ".join(track.name or "Unnamed" for track in tracks),
+        "track_count": len(tracks),
+        **_combine(track_rows),
+        "tracks": track_rows,
+    }
+
+
+def format_route_stats(stats: Dict[str, Any]) -> str:
+    """Render a stats row as prompt text."""
+    text = (
+        f"Tracks: {stats['track_count']} ({stats['track_names'] or 'none'})\n"
+        f"Segments: {stats['segment_count']}\n"
+        f"Points: {stats['point_count']}\n"
+        f"Distance: {stats['distance_km']:.2f} km\n"
+        f"Elevation gain: {stats['elevation_gain_m']:.1f} m\n"
+    )
+    if stats["start_lat"] is not None:
+        text += (
+            f"Start: ({stats['start_lat']}, {stats['start_lon']})\n"
+            f"End: ({stats['end_lat']}, {stats['end_lon']})\n"
+            f"Bounding box: ({stats['min_lat']}, {stats['min_lon']})"
+            f" to ({stats['max_lat']}, {stats['max_lon']})\n"
+        )
+    for track in stats.get("tracks", []):
+        text += (
+            f"Track {track['track_index'] + 1} ({track['track_name'] or 'Unnamed'}):"
+            f" {track['segment_count']} segments, {track['point_count']} points,"
+            f" {track['distance_km']:.2f} km, {track['elevation_gain_m']:.1f} m gain\n"
+        )
+    return text
+
+
+def _insert_sql(table: str, columns: Iterable[str]) -> str:
+    columns = list(columns)
+    placeholders = ", ".join(f":{column}" for column in columns)
+    return (
+        f"INSERT OR REPLACE INTO {table} ({', '.join(columns)})"
+        f" VALUES ({placeholders})"
+    )
+
+
+class RouteStatsStore:
+    """Per-file and per-track route statistics in local SQLite tables."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(_SCHEMA)
+            conn.execute(_TRACKS_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def upsert(self, stats: Dict[str, Any]) -> None:
+        """Replace a file's row and its per-track rows in one transaction."""
+        row = {column: stats.get(column) for column in COLUMNS}
+        row["updated_at"] = time.time()
+        track_rows = [
+            {column: track.get(column) for column in TRACK_COLUMNS}
+            for track in stats.get("tracks", [])
+        ]
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                "DELETE FROM route_tracks WHERE file_name = ?", (row["file_name"],)
+            )
+            conn.execute(_insert_sql("route_stats", COLUMNS), row)
+            conn.executemany(_insert_sql("route_tracks", TRACK_COLUMNS), track_rows)
+
+    def get_many(self, file_names: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Return file rows by name, each with its per-track rows in ``tracks``."""
+        file_names = list(file_names)
+        if not file_names:
+            return {}
+        placeholders = ", ".join("?" for _ in file_names)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT * FROM route_stats WHERE file_name IN ({placeholders})",
+                file_names,
+            ).fetchall()
+            track_rows = conn.execute(
+                f"SELECT * FROM route_tracks WHERE file_name IN ({placeholders})"
+                " ORDER BY file_name, track_index",
+                file_names,
+            ).fetchall()
+        stats = {row["file_name"]: {**dict(row), "tracks": []} for row in rows}
+        for track in track_rows:
+            if track["file_name"] in stats:
+                stats[track["file_name"]]["tracks"].append(dict(track))
+        return stats
+
+    def get(self, file_name: str) -> Optional[Dict[str, Any]]:
+        return self.get_many([file_name]).get(file_name)
+
+    def query(
+        self,
+        sort_by: str = "file_name",
+        descending: bool = False,
+        limit: Optional[int] = None,
+        min_values: Optional[Dict[str, float]] = None,
+        max_values: Optional[Dict[str, float]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Filter rows by numeric ranges and sort them by any column."""
+        if sort_by not in SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot sort by '{sort_by}'")
+        conditions = []
+        params: List[Any] = []
+        for operator, values in ((">=", min_values), ("<=", max_values)):
+            for column, value in (values or {}).items():
+                if column not in NUMERIC_COLUMNS:
+                    raise ValueError(f"Cannot filter by '{column}'")
+                conditions.append(f"{column} {operator} ?")
+                params.append(value)
+        sql = "SELECT * FROM route_stats"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY {sort_by} {'DESC' if descending else 'ASC'}, file_name"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
@@ -0,0 +1,39 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one upstream call.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same task instead of repeating it. Nothing is
+    cached once the task finishes.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Tuple[int, Hashable], "asyncio.Task[Any]"] = {}
+        # "calls" counts every request, "shared" those served by another call
+        self.stats = {"calls": 0, "shared": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        # Tasks belong to one event loop, so never share them across loops
+        flight_key = (id(asyncio.get_running_loop()), key)
+        self.stats["calls"] += 1
+        task = self._in_flight.get(flight_key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[flight_key] = task
+            task.add_done_callback(lambda done: self._finish(flight_key, done))
+        else:
+            self.stats["shared"] += 1
+        # Shield so one caller giving up does not cancel the others' result
+        return await asyncio.shield(task)
+
+    def _finish(
+        self, flight_key: Tuple[int, Hashable], task: "asyncio.Task[Any]"
+    ) -> None:
+        if self._in_flight.get(flight_key) is task:
+            del self._in_flight[flight_key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every waiter went away
+            task.exception()
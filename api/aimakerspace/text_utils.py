@@ -1,7 +1,8 @@
+import logging
 import os
-from typing import List
+from typing import Iterable, Iterator, List, Tuple
 
-from pypdf import PdfReader
+logger = logging.getLogger(__name__)
 
 
 class TextFileLoader:
@@ -25,11 +26,20 @@ class TextFileLoader:
             self.documents.append(f.read())
 
     def load_directory(self):
+        for _, text in self.iter_directory():
+            self.documents.append(text)
+
+    def iter_paths(self) -> Iterator[str]:
         for root, _, files in os.walk(self.path):
-            for file in files:
+            for file in sorted(files):
                 if file.endswith(".txt"):
-                    with open(os.path.join(root, file), encoding=self.encoding) as f:
-                        self.documents.append(f.read())
+                    yield os.path.join(root, file)
+
+    def iter_directory(self) -> Iterator[Tuple[str, str]]:
+        """Yield (path, text) one file at a time instead of loading them all."""
+        for file_path in self.iter_paths():
+            with open(file_path, encoding=self.encoding) as f:
+                yield file_path, f.read()
 
     def load_documents(self):
         self.load()
@@ -55,6 +65,23 @@ class CharacterTextSplitter:
             chunks.append(text[i : i + self.chunk_size])  # noqa: E203
         return chunks
 
+    def iter_split(self, texts: Iterable[str]) -> Iterator[str]:
+        """Split the concatenation of ``texts`` lazily.
+
+        Yields the same chunks as ``split("".join(texts))`` while only keeping
+        one chunk's worth of text in memory.
+        """
+        step = self.chunk_size - self.chunk_overlap
+        buffer = ""
+        for text in texts:
+            buffer += text
+            start = 0
+            while len(buffer) - start >= self.chunk_size:
+                yield buffer[start : start + self.chunk_size]  # noqa: E203
+                start += step
+            buffer = buffer[start:]
+        yield from self.split(buffer)
+
     def split_texts(self, texts: List[str]) -> List[str]:
         chunks = []
         for text in texts:
@@ -66,14 +93,14 @@ class PDFLoader:
     def __init__(self, path: str):
         self.documents: List[str] = []
         self.path = path
-        print(f"PDFLoader initialized with path: {self.path}")
+        logger.debug(f"PDFLoader initialized with path: {self.path}")
 
     def load(self):
-        print(f"Loading PDF from path: {self.path}")
-        print(f"Path exists: {os.path.exists(self.path)}")
-        print(f"Is file: {os.path.isfile(self.path)}")
-        print(f"Is directory: {os.path.isdir(self.path)}")
-        print(f"File permissions: {oct(os.stat(self.path).st_mode)[-3:]}")
+        logger.debug(f"Loading PDF from path: {self.path}")
+        logger.debug(f"Path exists: {os.path.exists(self.path)}")
+        logger.debug(f"Is file: {os.path.isfile(self.path)}")
+        logger.debug(f"Is directory: {os.path.isdir(self.path)}")
+        logger.debug(f"File permissions: {oct(os.stat(self.path).st_mode)[-3:]}")
 
         try:
             # Try to open the file first to verify access
@@ -89,31 +116,42 @@ class PDFLoader:
             raise ValueError(f"Error processing file at '{self.path}': {str(e)}")
 
     def load_file(self):
-        with open(self.path, "rb") as file:
+        self.documents.append(self.extract_text(self.path))
+
+    def load_directory(self):
+        for _, text in self.iter_directory():
+            self.documents.append(text)
+
+    @staticmethod
+    def extract_text(file_path: str) -> str:
+        return "".join(PDFLoader.iter_file_pages(file_path))
+
+    @staticmethod
+    def iter_file_pages(file_path: str) -> Iterator[str]:
+        from pypdf import PdfReader
+
+        with open(file_path, "rb") as file:
             # Create PDF reader object
             pdf_reader = PdfReader(file)
 
             # Extract text from each page
-            text = ""
             for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
+                yield page.extract_text() + "\n"
 
-            self.documents.append(text)
+    def iter_pages(self) -> Iterator[str]:
+        """Yield the text of each page of the PDF at ``path`` as it is extracted."""
+        return self.iter_file_pages(self.path)
 
-    def load_directory(self):
+    def iter_paths(self) -> Iterator[str]:
         for root, _, files in os.walk(self.path):
-            for file in files:
+            for file in sorted(files):
                 if file.lower().endswith(".pdf"):
-                    file_path = os.path.join(root, file)
-                    with open(file_path, "rb") as f:
-                        pdf_reader = PdfReader(f)
-
-                        # Extract text from each page
-                        text = ""
-                        for page in pdf_reader.pages:
-                            text += page.extract_text() + "\n"
+                    yield os.path.join(root, file)
 
-                        self.documents.append(text)
+    def iter_directory(self) -> Iterator[Tuple[str, str]]:
+        """Yield (path, text) one file at a time instead of loading them all."""
+        for file_path in self.iter_paths():
+            yield file_path, self.extract_text(file_path)
 
     def load_documents(self):
         self.load()
@@ -1,16 +1,26 @@
+from __future__ import annotations
+
 import asyncio
 import os
 import uuid
-from typing import List, Optional, Tuple
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple, Union
+
+from aimakerspace.singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    import numpy as np
+    from aimakerspace.openai_utils.embedding import EmbeddingModel
+    from qdrant_client import QdrantClient
+
 
-import numpy as np
-from aimakerspace.openai_utils.embedding import EmbeddingModel
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, PointStruct, VectorParams
+# Shared by all instances so identical concurrent searches hit Qdrant once
+search_flights = SingleFlight()
 
 
 def cosine_similarity(vector_a: np.array, vector_b: np.array) -> float:
     """Computes the cosine similarity between two vectors."""
+    import numpy as np
+
     dot_product = np.dot(vector_a, vector_b)
     norm_a = np.linalg.norm(vector_a)
     norm_b = np.linalg.norm(vector_b)
@@ -23,16 +33,37 @@ class VectorDatabase:
         embedding_model: Optional[EmbeddingModel] = None,
         collection_name: str = "default",
     ):
-        self.embedding_model = embedding_model or EmbeddingModel()
         self.collection_name = collection_name
-        # Qdrant connection
-        qdrant_url = os.getenv("QDRANT_URL", "http://localhost:6333")
-        api_key = os.getenv("QDRANT_API_KEY", None)
-        self.client = QdrantClient(url=qdrant_url, api_key=api_key)
-        self._ensure_collection()
-
-    def _ensure_collection(self):
-        # Create collection if it doesn't exist
+        # The embedding model and the Qdrant connection are created on first use
+        # so that constructing a VectorDatabase never touches the network.
+        self._embedding_model = embedding_model
+        self._client: Optional[QdrantClient] = None
+        self._collection_ready = False
+
+    @property
+    def embedding_model(self) -> EmbeddingModel:
+        if self._embedding_model is None:
+            from aimakerspace.openai_utils.embedding import EmbeddingModel
+
+            self._embedding_model = EmbeddingModel()
+        return self._embedding_model
+
+    @property
+    def client(self) -> QdrantClient:
+        if self._client is None:
+            from qdrant_client import QdrantClient
+
+            qdrant_url = os.getenv("QDRANT_URL", "http://localhost:6333")
+            api_key = os.getenv("QDRANT_API_KEY", None)
+            self._client = QdrantClient(url=qdrant_url, api_key=api_key)
+        return self._client
+
+    def ensure_collection(self) -> None:
+        # Create collection if it doesn't exist (checked once per instance)
+        if self._collection_ready:
+            return
+        from qdrant_client.http.models import Distance, VectorParams
+
         if self.collection_name not in [
             c.name for c in self.client.get_collections().collections
         ]:
@@ -42,10 +73,14 @@ class VectorDatabase:
                     size=1536, distance=Distance.COSINE
                 ),  # 1536 for OpenAI embeddings
             )
+        self._collection_ready = True
 
     def insert(
         self, text: str, vector: np.array, file_name: Optional[str] = None
     ) -> None:
+        from qdrant_client.http.models import PointStruct
+
+        self.ensure_collection()
         # Use a UUID for each point
         point_id = str(uuid.uuid4())
         payload = {"text": text}
@@ -62,9 +97,43 @@ class VectorDatabase:
             ],
         )
 
+    def insert_many(
+        self,
+        texts: List[str],
+        vectors: List[List[float]],
+        file_name: Union[str, Sequence[str], None] = None,
+        ids: Optional[List[str]] = None,
+    ) -> None:
+        """Upsert a batch of points in a single request.
+
+        ``file_name`` is either shared by all points or given per point. Passing
+        stable ``ids`` makes re-inserting the same chunks idempotent.
+        """
+        from qdrant_client.http.models import PointStruct
+
+        self.ensure_collection()
+        points = []
+        for i, (text, vector) in enumerate(zip(texts, vectors)):
+            payload = {"text": text}
+            point_file = file_name if isinstance(file_name, str) else None
+            if file_name is not None and point_file is None:
+                point_file = file_name[i]
+            if point_file:
+                payload["file_name"] = point_file
+            points.append(
+                PointStruct(
+                    id=ids[i] if ids else str(uuid.uuid4()),
+                    vector=list(vector),
+                    payload=payload,
+                )
+            )
+        if points:
+            self.client.upsert(collection_name=self.collection_name, points=points)
+
     def search(
         self, query_vector: List[float], k: int, file_name: Optional[str] = None
     ) -> List[Tuple[str, float]]:
+        self.ensure_collection()
         # Filter by file_name if provided
         search_filter = None
         if file_name:
@@ -92,8 +161,33 @@ class VectorDatabase:
             [r[0] for r in results] if return_as_text else results  # type: ignore[misc]
         )
 
+    async def asearch_by_text(
+        self,
+        query_text: str,
+        k: int,
+        return_as_text: bool = False,
+        file_name: Optional[str] = None,
+    ) -> List[Tuple[str, float]]:
+        results = await search_flights.do(
+            (self.collection_name, query_text, k, file_name),
+            lambda: self._asearch_by_text(query_text, k, file_name),
+        )
+        # Each caller gets its own list since the results are shared
+        return (
+            [r[0] for r in results]  # type: ignore[misc]
+            if return_as_text
+            else list(results)
+        )
+
+    async def _asearch_by_text(
+        self, query_text: str, k: int, file_name: Optional[str]
+    ) -> List[Tuple[str, float]]:
+        query_vector = await self.embedding_model.async_get_embedding(query_text)
+        return await asyncio.to_thread(self.search, query_vector, k, file_name)
+
     def retrieve_from_key(self, key: str) -> Optional[str]:
         # Not directly supported; would need to search by payload
+        self.ensure_collection()
         hits = self.client.scroll(
             collection_name=self.collection_name,
             scroll_filter={"must": [{"key": "text", "match": {"value": key}}]},
@@ -105,10 +199,9 @@ class VectorDatabase:
 
     async def abuild_from_list(
         self, list_of_text: List[str], file_name: Optional[str] = None
-    ) -> "VectorDatabase":
+    ) -> VectorDatabase:
         embeddings = await self.embedding_model.async_get_embeddings(list_of_text)
-        for text, embedding in zip(list_of_text, embeddings):
-            self.insert(text, np.array(embedding), file_name=file_name)
+        self.insert_many(list_of_text, embeddings, file_name=file_name)
         return self
 
 
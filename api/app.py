@@ -1,25 +1,56 @@
 # Import required FastAPI components for building the API
+import asyncio
+import logging
+import math
+import mimetypes
 import os
 import shutil
 import tempfile
-from typing import List, Optional
-
-# Import gpxpy for GPX file processing
-import gpxpy
-from aimakerspace.text_utils import CharacterTextSplitter, PDFLoader
-from aimakerspace.vectordatabase import VectorDatabase
-from fastapi import Body, FastAPI, File, HTTPException, UploadFile
+from contextlib import asynccontextmanager
+from email.utils import formatdate, parsedate_to_datetime
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Optional, Union
+
+from aimakerspace.openai_utils.ratelimit import (
+    ConcurrencyTimeout,
+    RateLimitExceeded,
+    estimate_tokens,
+    get_rate_limiter,
+)
+from fastapi import Body, FastAPI, File, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, StreamingResponse
-
-# Import OpenAI client for interacting with OpenAI's API
-from openai import OpenAI
+from fastapi.responses import FileResponse, Response, StreamingResponse
 
 # Import Pydantic for data validation and settings management
 from pydantic import BaseModel
 
+# Heavy dependencies (gpxpy, pypdf, qdrant_client, openai, numpy) are imported
+# lazily inside the handlers that need them to keep serverless cold starts fast.
+if TYPE_CHECKING:
+    from aimakerspace.route_stats import RouteStatsStore
+    from aimakerspace.vectordatabase import VectorDatabase
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Opt-in: long-running servers can pay the import cost before serving
+    # traffic, while serverless deployments keep the default lazy behaviour.
+    app.state.warmup_error = None
+    if os.getenv("WARMUP_ON_STARTUP", "").lower() in ("1", "true", "yes"):
+        try:
+            await asyncio.to_thread(warmup)
+        except Exception as e:
+            # Serve anyway, as without warmup; /api/health reports the failure
+            logger.warning(f"Warmup on startup failed: {e!r}")
+            app.state.warmup_error = str(e)
+    yield
+
+
 # Initialize FastAPI application with a title
-app = FastAPI(title="OpenAI Chat API")
+app = FastAPI(title="OpenAI Chat API", lifespan=lifespan)
 
 # Configure CORS (Cross-Origin Resource Sharing) middleware
 # This allows the API to be accessed from different domains/origins
@@ -33,6 +64,57 @@ app.add_middleware(
 
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploaded_files")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+ROUTE_STATS_DB = os.getenv(
+    "ROUTE_STATS_DB", os.path.join(UPLOAD_DIR, ".route_stats.sqlite3")
+)
+
+
+@lru_cache(maxsize=None)
+def get_vector_db() -> "VectorDatabase":
+    """Return the process-wide VectorDatabase, created on first use."""
+    from aimakerspace.vectordatabase import VectorDatabase
+
+    return VectorDatabase()
+
+
+@lru_cache(maxsize=None)
+def get_route_stats_store() -> "RouteStatsStore":
+    """Return the local table of per-file GPX route statistics."""
+    from aimakerspace.route_stats import RouteStatsStore
+
+    return RouteStatsStore(ROUTE_STATS_DB)
+
+
+@lru_cache(maxsize=8)
+def get_openai_client(api_key: str) -> "AsyncOpenAI":
+    """Return a cached OpenAI client for the given API key."""
+    from openai import AsyncOpenAI
+
+    # Retries are handled by the shared rate limiter instead of the SDK
+    return AsyncOpenAI(api_key=api_key, max_retries=0)
+
+
+def rate_limited(error: Union[RateLimitExceeded, ConcurrencyTimeout]) -> HTTPException:
+    """Translate OpenAI throttling into a 429 and a full local queue into a 503."""
+    return HTTPException(
+        status_code=429 if isinstance(error, RateLimitExceeded) else 503,
+        detail=str(error),
+        headers={"Retry-After": str(math.ceil(error.retry_after))},
+    )
+
+
+def warmup() -> None:
+    """Import heavy modules and create shared clients ahead of the first request."""
+    import numpy  # noqa: F401
+    import pypdf  # noqa: F401
+    from aimakerspace import gpx_utils  # noqa: F401
+
+    get_route_stats_store()
+    vector_db = get_vector_db()
+    vector_db.ensure_collection()
+    if os.getenv("OPENAI_API_KEY"):
+        # Touching the lazy property creates the client the handlers embed with
+        vector_db.embedding_model.async_client
 
 
 # Define the data model for chat requests using Pydantic
@@ -54,67 +136,80 @@ class SearchRequestModel(BaseModel):
 @app.post("/api/chat")
 async def chat(request: ChatRequest):
     try:
-        client = OpenAI(api_key=request.api_key)
-        vector_db = VectorDatabase()
+        client = get_openai_client(request.api_key)
         file_names = request.file_names
         if not file_names or len(file_names) == 0:
             raise HTTPException(
                 status_code=400, detail="At least one file must be provided."
             )
-        if len(file_names) == 1:
-            # Single file mode
-            relevant_chunks = vector_db.search_by_text(
+        if len(file_names) > 2:
+            raise HTTPException(
+                status_code=400, detail="You can only compare up to two files."
+            )
+
+        # GPX routes with stored statistics get their exact numbers injected
+        # into the prompt; other files fall back to retrieving text chunks.
+        from aimakerspace.route_stats import format_route_stats
+
+        route_stats = await asyncio.to_thread(
+            get_route_stats_store().get_many, file_names
+        )
+
+        async def file_context(file_name: str) -> str:
+            if file_name in route_stats:
+                return "Route statistics:\n" + format_route_stats(
+                    route_stats[file_name]
+                )
+            relevant_chunks = await get_vector_db().asearch_by_text(
                 request.user_message,
                 k=5,
                 return_as_text=True,
-                file_name=file_names[0],
+                file_name=file_name,
             )
-            context = "\n".join(relevant_chunks)
+            return "Context:\n" + "\n".join(relevant_chunks)
+
+        if len(file_names) == 1:
+            # Single file mode
+            context = await file_context(file_names[0])
             rag_message = (
-                "You are a helpful assistant. Use the following context from the user's document to answer the question.\nContext:\n"
+                "You are a helpful assistant. Use the following context from the user's document to answer the question.\n"
                 + context
             )
-        elif len(file_names) == 2:
-            # Comparison mode
-            relevant_chunks_1 = vector_db.search_by_text(
-                request.user_message,
-                k=5,
-                return_as_text=True,
-                file_name=file_names[0],
-            )
-            relevant_chunks_2 = vector_db.search_by_text(
-                request.user_message,
-                k=5,
-                return_as_text=True,
-                file_name=file_names[1],
+        else:
+            # Comparison mode; concurrent searches share the question embedding
+            context_1, context_2 = await asyncio.gather(
+                file_context(file_names[0]), file_context(file_names[1])
             )
-            context_1 = "\n".join(relevant_chunks_1)
-            context_2 = "\n".join(relevant_chunks_2)
             rag_message = (
                 f"You are a helpful assistant. Compare the following two GPX routes based on the user's question. Use the provided context for each route.\n"
-                f"\nRoute 1: {file_names[0]}\nContext:\n{context_1}\n"
-                f"\nRoute 2: {file_names[1]}\nContext:\n{context_2}\n"
-            )
-        else:
-            raise HTTPException(
-                status_code=400, detail="You can only compare up to two files."
+                f"\nRoute 1: {file_names[0]}\n{context_1}\n"
+                f"\nRoute 2: {file_names[1]}\n{context_2}\n"
             )
 
-        async def generate():
-            stream = client.chat.completions.create(
+        # Open the stream before responding so throttling surfaces as a 429
+        stream = await get_rate_limiter(request.api_key, request.model).acall(
+            lambda: client.chat.completions.with_raw_response.create(
                 model=request.model,
                 messages=[
                     {"role": "system", "content": rag_message},
                     {"role": "user", "content": request.user_message},
                 ],
                 stream=True,
-            )
-            for chunk in stream:
-                if chunk.choices[0].delta.content is not None:
+            ),
+            tokens=estimate_tokens([rag_message, request.user_message]),
+        )
+
+        async def generate():
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content is not None:
                     yield chunk.choices[0].delta.content
 
         return StreamingResponse(generate(), media_type="text/plain")
 
+    except HTTPException:
+        raise
+    except (RateLimitExceeded, ConcurrencyTimeout) as e:
+        raise rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -126,7 +221,7 @@ async def health_check():
 
     # Check vector database connection
     try:
-        vector_db = VectorDatabase()
+        vector_db = get_vector_db()
         # Try a simple operation to verify connection
         vector_db.client.get_collections()
         health_status["vector_db"] = "ok"
@@ -135,9 +230,27 @@ async def health_check():
         health_status["vector_db_error"] = str(e)
         health_status["overall"] = "degraded"
 
+    warmup_error = getattr(app.state, "warmup_error", None)
+    if warmup_error:
+        health_status["warmup"] = "error"
+        health_status["warmup_error"] = warmup_error
+        health_status["overall"] = "degraded"
+
     return health_status
 
 
+# Warmup hook for platforms that can ping a URL right after deploying
+@app.get("/api/warmup")
+async def warmup_endpoint():
+    try:
+        # Creating the collection talks to Qdrant; keep it off the event loop
+        await asyncio.to_thread(warmup)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Warmup failed: {str(e)}")
+    app.state.warmup_error = None
+    return {"status": "warm"}
+
+
 @app.post("/api/upload_pdf")
 async def upload_pdf(file: UploadFile = File(...)):
     if not file.filename.lower().endswith(".pdf"):
@@ -151,25 +264,33 @@ async def upload_pdf(file: UploadFile = File(...)):
     shutil.copy(tmp_path, dest_path)
 
     try:
-        # Load and extract text from PDF
-        loader = PDFLoader(dest_path)
-        documents = loader.load_documents()  # List of extracted text (usually one item)
-        if not documents or not documents[0].strip():
+        from aimakerspace.file_store import precompress
+        from aimakerspace.pipeline import aingest_chunks
+        from aimakerspace.text_utils import CharacterTextSplitter, PDFLoader
+
+        file_meta = await asyncio.to_thread(precompress, dest_path)
+
+        # Stream pages -> chunks -> embedding batches -> upsert batches, so
+        # early pages are embedded while later ones are still being extracted
+        splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+        chunks = splitter.iter_split(PDFLoader(dest_path).iter_pages())
+        chunks_uploaded = await aingest_chunks(
+            chunks, get_vector_db(), file_name=file.filename
+        )
+        if not chunks_uploaded:
             raise HTTPException(
                 status_code=400, detail="No extractable text found in PDF."
             )
 
-        # Chunk the text
-        splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        chunks = splitter.split_texts(documents)
-        if not chunks:
-            raise HTTPException(status_code=400, detail="Failed to chunk PDF text.")
-
-        # Upload chunks to vector database, include file name
-        vector_db = VectorDatabase()
-        await vector_db.abuild_from_list(chunks, file_name=file.filename)
-
-        return {"status": "success", "chunks_uploaded": len(chunks)}
+        return {
+            "status": "success",
+            "chunks_uploaded": chunks_uploaded,
+            "content_hash": file_meta["sha256"],
+        }
+    except HTTPException:
+        raise
+    except (RateLimitExceeded, ConcurrencyTimeout) as e:
+        raise rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
 
@@ -187,33 +308,42 @@ async def upload_gpx(file: UploadFile = File(...)):
     shutil.copy(tmp_path, dest_path)
 
     try:
-        # Parse GPX file
-        with open(dest_path) as gpx_file:
-            gpx = gpxpy.parse(gpx_file)
+        from aimakerspace.file_store import precompress
+        from aimakerspace.gpx_utils import load_gpx_tracks
+        from aimakerspace.route_stats import summarize_tracks
+        from aimakerspace.text_utils import CharacterTextSplitter
+
+        # Store compressed copies for /api/file and stream the GPX track
+        # points into compact arrays, both off the event loop
+        file_meta, tracks = await asyncio.gather(
+            asyncio.to_thread(precompress, dest_path),
+            asyncio.to_thread(load_gpx_tracks, dest_path),
+        )
+
+        # Measure every segment once; the numbers feed both the stored stats
+        # (for sorting, filtering and chat prompts) and the text summary
+        stats = summarize_tracks(file.filename, tracks)
+        await asyncio.to_thread(get_route_stats_store().upsert, stats)
 
         # Extract summary and details
         summary = f"GPX file: {file.filename}\n"
-        if gpx.tracks:
-            for i, track in enumerate(gpx.tracks):
-                summary += f"Track {i+1}: {track.name or 'Unnamed'}\n"
-                for j, segment in enumerate(track.segments):
-                    points = segment.points
-                    summary += f"  Segment {j+1}: {len(points)} points\n"
-                    if points:
-                        start = points[0]
-                        end = points[-1]
+        if stats["tracks"]:
+            for track in stats["tracks"]:
+                summary += (
+                    f"Track {track['track_index'] + 1}: "
+                    f"{track['track_name'] or 'Unnamed'}\n"
+                )
+                for j, segment in enumerate(track["segments"]):
+                    summary += f"  Segment {j+1}: {segment['point_count']} points\n"
+                    if segment["point_count"]:
+                        start = segment["start_lat"], segment["start_lon"]
+                        end = segment["end_lat"], segment["end_lon"]
                         summary += (
-                            f"    Start: ({start.latitude}, {start.longitude})\n"
-                            f"    End: ({end.latitude}, {end.longitude})\n"
+                            f"    Start: ({start[0]}, {start[1]})\n"
+                            f"    End: ({end[0]}, {end[1]})\n"
+                            f"    Distance: {segment['distance_km']:.2f} km\n"
+                            f"    Elevation gain: {segment['elevation_gain_m']:.1f} m\n"
                         )
-                        total_distance = segment.length_3d() / 1000  # km
-                        summary += f"    Distance: {total_distance:.2f} km\n"
-                        elev_gain = sum(
-                            max(0, b.elevation - a.elevation)
-                            for a, b in zip(points, points[1:])
-                            if a.elevation is not None and b.elevation is not None
-                        )
-                        summary += f"    Elevation gain: {elev_gain:.1f} m\n"
         else:
             summary += "No tracks found.\n"
 
@@ -224,9 +354,17 @@ async def upload_gpx(file: UploadFile = File(...)):
             raise HTTPException(status_code=400, detail="Failed to chunk GPX data.")
 
         # Upload chunks to vector database, include file name and type
-        vector_db = VectorDatabase()
+        vector_db = get_vector_db()
         await vector_db.abuild_from_list(chunks, file_name=file.filename)
-        return {"status": "success", "chunks_uploaded": len(chunks)}
+        return {
+            "status": "success",
+            "chunks_uploaded": len(chunks),
+            "content_hash": file_meta["sha256"],
+        }
+    except HTTPException:
+        raise
+    except (RateLimitExceeded, ConcurrencyTimeout) as e:
+        raise rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing GPX: {str(e)}")
 
@@ -235,18 +373,71 @@ async def upload_gpx(file: UploadFile = File(...)):
 async def search_chunks(request: SearchRequestModel = Body(...)):
     """Search for the top-k most similar chunks in the vector database using Qdrant."""
     try:
-        vector_db = VectorDatabase()
-        results = vector_db.search_by_text(request.query, k=request.k)
+        vector_db = get_vector_db()
+        results = await vector_db.asearch_by_text(request.query, k=request.k)
         # results: List[Tuple[str, float]]
         return {"results": [{"text": text, "score": score} for text, score in results]}
+    except HTTPException:
+        raise
+    except (RateLimitExceeded, ConcurrencyTimeout) as e:
+        raise rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error during search: {str(e)}")
 
 
+@app.get("/api/route_stats")
+async def query_route_stats(
+    sort_by: str = "file_name",
+    order: str = "asc",
+    limit: Optional[int] = None,
+    min_distance_km: Optional[float] = None,
+    max_distance_km: Optional[float] = None,
+    min_elevation_gain_m: Optional[float] = None,
+    max_elevation_gain_m: Optional[float] = None,
+    min_point_count: Optional[int] = None,
+    max_point_count: Optional[int] = None,
+):
+    """Return per-file GPX route statistics, filtered and sorted."""
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'.")
+    bounds = {
+        "distance_km": (min_distance_km, max_distance_km),
+        "elevation_gain_m": (min_elevation_gain_m, max_elevation_gain_m),
+        "point_count": (min_point_count, max_point_count),
+    }
+    try:
+        routes = await asyncio.to_thread(
+            get_route_stats_store().query,
+            sort_by=sort_by,
+            descending=order == "desc",
+            limit=limit,
+            min_values={c: lo for c, (lo, _) in bounds.items() if lo is not None},
+            max_values={c: hi for c, (_, hi) in bounds.items() if hi is not None},
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"routes": routes}
+
+
+@app.get("/api/stats")
+async def stats():
+    """Report how many embedding and search calls were coalesced."""
+    from aimakerspace.openai_utils.embedding import embedding_flights
+    from aimakerspace.vectordatabase import search_flights
+
+    return {
+        "coalescing": {
+            "embeddings": embedding_flights.stats,
+            "search": search_flights.stats,
+        }
+    }
+
+
 @app.get("/api/files")
 async def list_files():
     """Return a list of unique file names stored in Qdrant."""
-    vector_db = VectorDatabase()
+    vector_db = get_vector_db()
+    vector_db.ensure_collection()
     # Scroll all points and collect unique file names
     file_names = set()
     scroll = vector_db.client.scroll(
@@ -259,12 +450,68 @@ async def list_files():
     return {"files": sorted(file_names)}
 
 
+def _not_modified(request: Request, sha256: str, mtime: float) -> bool:
+    from aimakerspace.file_store import etag_matches
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, sha256)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since
+    return False
+
+
 @app.get("/api/file/{file_name}")
-async def get_uploaded_file(file_name: str):
+async def get_uploaded_file(file_name: str, request: Request, v: Optional[str] = None):
+    """Serve an uploaded file with validators, precompression and ranges.
+
+    Pass ``v=<content_hash>`` (returned by the upload endpoints) to make the
+    response cacheable forever; otherwise clients revalidate and get a 304.
+    """
+    from aimakerspace.file_store import choose_encoding, encoded_path, file_meta
+
     file_path = os.path.join(UPLOAD_DIR, file_name)
-    if not os.path.exists(file_path):
+    # Hidden entries (precompressed copies, route stats) are not uploads
+    if file_name.startswith(".") or not os.path.isfile(file_path):
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(file_path, filename=file_name)
+
+    meta = await asyncio.to_thread(file_meta, file_path)
+    sha256 = meta["sha256"]
+    immutable = v is not None and len(v) >= 8 and sha256.startswith(v)
+    headers = {
+        "ETag": f'"{sha256}"',
+        "Last-Modified": formatdate(meta["mtime"], usegmt=True),
+        "Cache-Control": (
+            "public, max-age=31536000, immutable" if immutable else "no-cache"
+        ),
+        "Vary": "Accept-Encoding",
+    }
+    # Byte ranges refer to the identity encoding, so only compress full bodies
+    encoding = None
+    if "range" not in request.headers:
+        encoding = choose_encoding(
+            request.headers.get("accept-encoding", ""), meta["encodings"]
+        )
+    if encoding is not None:
+        headers["ETag"] = f'"{sha256}-{encoding}"'
+        headers["Content-Encoding"] = encoding
+
+    # A 304 carries the validators of the representation it stands for
+    if _not_modified(request, sha256, meta["mtime"]):
+        return Response(status_code=304, headers=headers)
+    if encoding is None:
+        return FileResponse(file_path, filename=file_name, headers=headers)
+    return FileResponse(
+        encoded_path(file_path, encoding),
+        filename=file_name,
+        headers=headers,
+        media_type=mimetypes.guess_type(file_name)[0] or "application/octet-stream",
+    )
 
 
 # Entry point for running the application directly
@@ -0,0 +1,105 @@
+"""Measure cold-start import cost of the API and of its heavy dependencies.
+
+Every measurement runs in a fresh interpreter so nothing is cached between runs.
+
+Usage (from the ``api`` directory):
+    python scripts/bench_startup.py [--runs 5] [--top 15]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = [
+    "fastapi",
+    "pydantic",
+    "numpy",
+    "openai",
+    "qdrant_client",
+    "gpxpy",
+    "pypdf",
+]
+
+
+def import_profile(module: str) -> Tuple[int, Dict[str, int]]:
+    """Import ``module`` under ``-X importtime`` in a fresh interpreter.
+
+    Returns the module's cumulative import time in microseconds and the
+    cumulative time of each module it imports directly.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=API_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # -X importtime prints children before their parent, indented by two
+    # spaces per nesting level.
+    children: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")  # noqa: E203
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        if depth == 1:
+            children[name.strip()] = int(cumulative)
+        elif depth == 0:
+            if name.strip() == module:
+                return int(cumulative), children
+            children = {}
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def median_profile(module: str, runs: int) -> Tuple[float, Dict[str, float]]:
+    totals: List[int] = []
+    samples: Dict[str, List[int]] = defaultdict(list)
+    for _ in range(runs):
+        total, children = import_profile(module)
+        totals.append(total)
+        for name, us in children.items():
+            samples[name].append(us)
+    return statistics.median(totals), {
+        name: statistics.median(values) for name, values in samples.items()
+    }
+
+
+def print_table(title: str, total: float, times: Dict[str, float], top: int) -> None:
+    print(f"\n{title} (total {total / 1000:.1f} ms)")
+    print(f"{'module':<40}{'ms':>10}{'share':>8}")
+    for name, us in sorted(times.items(), key=lambda item: -item[1])[:top]:
+        share = us / total if total else 0
+        print(f"{name:<40}{us / 1000:>10.1f}{share:>8.0%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Samples per module")
+    parser.add_argument("--top", type=int, default=15, help="Rows to show")
+    args = parser.parse_args()
+
+    total, children = median_profile("app", args.runs)
+    print_table("import app", total, children, args.top)
+
+    isolated: Dict[str, float] = {}
+    for module in HEAVY_MODULES:
+        try:
+            isolated[module], _ = median_profile(module, args.runs)
+        except subprocess.CalledProcessError:
+            print(f"skipping {module}: not installed", file=sys.stderr)
+    print_table(
+        "heavy dependencies, each imported in isolation",
+        sum(isolated.values()),
+        isolated,
+        args.top,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -78,6 +78,27 @@ def test_upload_gpx_and_search(sample_gpx_bytes):
     assert "test.gpx" in files
 
 
+def test_route_stats_after_gpx_upload(sample_gpx_bytes):
+    client = TestClient(app)
+    response = client.post(
+        "/api/upload_gpx",
+        files={"file": ("stats.gpx", sample_gpx_bytes, "application/gpx+xml")},
+    )
+    assert response.status_code == 200, response.text
+
+    stats_response = client.get(
+        "/api/route_stats",
+        params={"sort_by": "elevation_gain_m", "order": "desc"},
+    )
+    assert stats_response.status_code == 200, stats_response.text
+    routes = {r["file_name"]: r for r in stats_response.json()["routes"]}
+    assert routes["stats.gpx"]["point_count"] == 3
+    assert routes["stats.gpx"]["elevation_gain_m"] == 20
+
+    bad_response = client.get("/api/route_stats", params={"sort_by": "nope"})
+    assert bad_response.status_code == 400
+
+
 def test_health_check():
     client = TestClient(app)
     response = client.get("/api/health")
@@ -87,3 +108,38 @@ def test_health_check():
     assert "vector_db" in data
     assert data["api"] == "ok"
     assert data["overall"] in ("ok", "degraded")
+
+
+def test_get_file_supports_conditional_and_compressed_requests(
+    sample_gpx_bytes, tmp_path, monkeypatch
+):
+    # Keep the file and its precompressed copies out of the real upload dir
+    monkeypatch.setattr("api.app.UPLOAD_DIR", str(tmp_path))
+    (tmp_path / "cached.gpx").write_bytes(sample_gpx_bytes)
+    client = TestClient(app)
+
+    response = client.get("/api/file/cached.gpx", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.content == sample_gpx_bytes
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["cache-control"] == "no-cache"
+    etag = response.headers["etag"]
+
+    not_modified = client.get(
+        "/api/file/cached.gpx",
+        headers={"If-None-Match": etag, "Accept-Encoding": "gzip"},
+    )
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    # The 304 names the gzip representation the client has cached
+    assert not_modified.headers["etag"] == etag
+
+    content_hash = etag.strip('"').split("-")[0]
+    versioned = client.get(
+        "/api/file/cached.gpx",
+        params={"v": content_hash},
+        headers={"Range": "bytes=0-9", "Accept-Encoding": "identity"},
+    )
+    assert versioned.status_code == 206
+    assert versioned.content == sample_gpx_bytes[:10]
+    assert "immutable" in versioned.headers["cache-control"]
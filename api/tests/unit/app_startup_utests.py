@@ -0,0 +1,53 @@
+import json
+import os
+import subprocess
+import sys
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+HEAVY_MODULES = ["gpxpy", "pypdf", "qdrant_client", "openai", "numpy"]
+
+
+def test_importing_app_leaves_heavy_dependencies_unloaded(tmp_path):
+    # A fresh interpreter, since this test session may already have loaded them
+    script = (
+        "import json, sys\n"
+        "import app\n"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=API_DIR,
+        env={**os.environ, "UPLOAD_DIR": str(tmp_path)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert json.loads(result.stdout) == []
+
+
+def test_failed_startup_warmup_is_reported_by_health_check(tmp_path):
+    script = (
+        "import json\n"
+        "from fastapi.testclient import TestClient\n"
+        "import app\n"
+        "with TestClient(app.app) as client:\n"
+        "    print(json.dumps(client.get('/api/health').json()))\n"
+    )
+    env = {
+        **os.environ,
+        "UPLOAD_DIR": str(tmp_path),
+        "WARMUP_ON_STARTUP": "1",
+        # Nothing listens here, so creating the collection fails
+        "QDRANT_URL": "http://127.0.0.1:1",
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=API_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    health = json.loads(result.stdout)
+    assert health["overall"] == "degraded"
+    assert health["warmup"] == "error"
@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+
+class FakeEmbeddingModel:
+    async def async_get_embeddings(self, texts):
+        await asyncio.sleep(0)
+        return [[float(len(text))] for text in texts]
+
+
+class FakeVectorDatabase:
+    def __init__(self):
+        self.embedding_model = FakeEmbeddingModel()
+        self.upserts = []
+
+    def insert_many(self, texts, vectors, file_name=None, ids=None):
+        self.upserts.append((list(texts), list(file_name), list(ids)))
+
+    def ids(self):
+        return [point for _, _, ids in self.upserts for point in ids]
+
+    def points(self):
+        return [
+            (name, point)
+            for _, file_names, ids in self.upserts
+            for name, point in zip(file_names, ids)
+        ]
+
+
+@pytest.fixture
+def make_vector_db():
+    return FakeVectorDatabase
+
+
+@pytest.fixture
+def vector_db(make_vector_db):
+    return make_vector_db()
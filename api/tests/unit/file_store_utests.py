@@ -0,0 +1,67 @@
+import gzip
+import hashlib
+import os
+
+import pytest
+from aimakerspace.file_store import (
+    choose_encoding,
+    encoded_path,
+    etag_matches,
+    file_meta,
+    precompress,
+)
+
+GPX_BYTES = b"<gpx>" + b"<trkpt lat='42' lon='-1'/>" * 500 + b"</gpx>"
+
+
+def test_precompress_stores_hash_and_gzip_copy(tmp_path):
+    path = tmp_path / "route.gpx"
+    path.write_bytes(GPX_BYTES)
+
+    meta = precompress(str(path))
+
+    assert meta["sha256"] == hashlib.sha256(GPX_BYTES).hexdigest()
+    assert "gzip" in meta["encodings"]
+    with open(encoded_path(str(path), "gzip"), "rb") as f:
+        assert gzip.decompress(f.read()) == GPX_BYTES
+
+
+def test_precompress_stores_brotli_copy(tmp_path):
+    brotli = pytest.importorskip("brotli")
+    path = tmp_path / "route.gpx"
+    path.write_bytes(GPX_BYTES)
+
+    meta = precompress(str(path))
+
+    assert meta["encodings"] == ["br", "gzip"]
+    with open(encoded_path(str(path), "br"), "rb") as f:
+        assert brotli.decompress(f.read()) == GPX_BYTES
+
+
+def test_file_meta_reuses_record_until_file_changes(tmp_path):
+    path = tmp_path / "route.gpx"
+    path.write_bytes(GPX_BYTES)
+    first = file_meta(str(path))
+    assert file_meta(str(path)) == first
+
+    path.write_bytes(b"<gpx></gpx>")
+    os.utime(path, ns=(0, first["mtime_ns"] + 1))
+    second = file_meta(str(path))
+    assert second["sha256"] == hashlib.sha256(b"<gpx></gpx>").hexdigest()
+    # Compression would not make the tiny file smaller
+    assert second["encodings"] == []
+
+
+def test_choose_encoding_prefers_brotli_and_honours_q0():
+    assert choose_encoding("gzip, deflate, br", ["br", "gzip"]) == "br"
+    assert choose_encoding("gzip, br;q=0", ["br", "gzip"]) == "gzip"
+    assert choose_encoding("br", ["gzip"]) is None
+    assert choose_encoding("", ["br", "gzip"]) is None
+
+
+def test_etag_matches_any_representation():
+    sha = "ab" * 32
+    assert etag_matches(f'"{sha}"', sha)
+    assert etag_matches(f'W/"{sha}-gzip", "other"', sha)
+    assert etag_matches("*", sha)
+    assert not etag_matches('"other"', sha)
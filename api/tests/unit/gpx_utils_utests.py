@@ -0,0 +1,84 @@
+import math
+
+import pytest
+from aimakerspace.gpx_utils import GPXStreamError, iterparse_tracks, load_gpx_tracks
+
+SAMPLE_GPX = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1">
+  <wpt lat="41.9" lon="2.0"><name>Parking</name></wpt>
+  <trk>
+    <name>Morning ride</name>
+    <trkseg>
+      <trkpt lat="42.0" lon="-1.0">
+        <ele>100</ele><time>2024-05-01T08:00:00Z</time>
+      </trkpt>
+      <trkpt lat="42.001" lon="-1.001"><ele>120</ele></trkpt>
+      <trkpt lat="42.002" lon="-1.002"><ele>110</ele></trkpt>
+      <trkpt lat="42.003" lon="-1.003"></trkpt>
+    </trkseg>
+  </trk>
+  <trk><trkseg></trkseg></trk>
+</gpx>
+"""
+
+
+@pytest.fixture
+def sample_gpx_path(tmp_path):
+    path = tmp_path / "sample.gpx"
+    path.write_text(SAMPLE_GPX)
+    return str(path)
+
+
+def test_streams_track_points_into_arrays(sample_gpx_path):
+    tracks = iterparse_tracks(sample_gpx_path)
+
+    assert [track.name for track in tracks] == ["Morning ride", None]
+    segment = tracks[0].segments[0]
+    assert len(segment) == 4
+    assert segment.start() == (42.0, -1.0)
+    assert segment.end() == (42.003, -1.003)
+    assert segment.bounds() == (42.0, -1.003, 42.003, -1.0)
+    assert math.isnan(segment.elevations[3])
+    assert segment.times[0] == 1714550400.0
+    assert math.isnan(segment.times[1])
+    assert len(tracks[1].segments[0]) == 0
+
+
+def test_stats_match_gpxpy(sample_gpx_path):
+    gpxpy = pytest.importorskip("gpxpy")
+    with open(sample_gpx_path) as f:
+        reference = gpxpy.parse(f).tracks[0].segments[0]
+
+    segment = iterparse_tracks(sample_gpx_path)[0].segments[0]
+    assert segment.length_3d() == pytest.approx(reference.length_3d())
+    assert segment.elevation_gain() == pytest.approx(20.0)
+
+
+def test_non_gpx_documents_are_left_to_gpxpy(tmp_path):
+    path = tmp_path / "other.xml"
+    path.write_text("<kml><Document/></kml>")
+
+    with pytest.raises(GPXStreamError):
+        iterparse_tracks(str(path))
+
+
+def test_load_gpx_tracks_streams_regular_files(sample_gpx_path):
+    assert len(load_gpx_tracks(sample_gpx_path)[0].segments[0]) == 4
+
+
+def test_load_gpx_tracks_falls_back_to_gpxpy(tmp_path):
+    pytest.importorskip("gpxpy")
+    path = tmp_path / "upper.gpx"
+    # gpxpy does not check the root element's name; the streaming parser does
+    path.write_text(SAMPLE_GPX.replace("<gpx ", "<GPX ").replace("</gpx>", "</GPX>"))
+
+    with pytest.raises(GPXStreamError):
+        iterparse_tracks(str(path))
+    tracks = load_gpx_tracks(str(path))
+
+    assert [track.name for track in tracks] == ["Morning ride", None]
+    segment = tracks[0].segments[0]
+    assert len(segment) == 4
+    assert segment.start() == (42.0, -1.0)
+    assert math.isnan(segment.elevations[3])
+    assert segment.times[0] == 1714550400.0
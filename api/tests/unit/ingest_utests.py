@@ -0,0 +1,190 @@
+import asyncio
+import io
+import os
+import uuid
+
+import pytest
+from aimakerspace.ingest import Checkpoint, ingest_directory
+from aimakerspace.pipeline import point_id
+from aimakerspace.text_utils import PDFLoader, TextFileLoader
+from aimakerspace.vectordatabase import VectorDatabase
+from reportlab.pdfgen import canvas
+
+
+class FakeQdrantClient:
+    def __init__(self):
+        self.upserts = []
+
+    def upsert(self, collection_name, points):
+        self.upserts.append((collection_name, points))
+
+
+def write_pdf(path, lines):
+    c = canvas.Canvas(str(path))
+    for i, line in enumerate(lines):
+        c.drawString(100, 750 - 20 * i, line)
+    c.save()
+
+
+def ingest(directory, vector_db, checkpoint, **kwargs):
+    kwargs.setdefault("workers", 1)
+    return asyncio.run(
+        ingest_directory(
+            str(directory),
+            vector_db,
+            checkpoint,
+            progress_stream=io.StringIO(),
+            **kwargs,
+        )
+    )
+
+
+def test_point_id_is_deterministic_per_file_and_chunk():
+    assert point_id("a.txt", 0) == point_id("a.txt", 0)
+    assert point_id("a.txt", 0) != point_id("a.txt", 1)
+    assert point_id("a.txt", 0) != point_id("b.txt", 0)
+    assert uuid.UUID(point_id("a.txt", 0)).version == 5
+
+
+def test_checkpoint_resume_skips_done_files(tmp_path, vector_db, make_vector_db):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.txt").write_text("alpha")
+    (docs / "b.txt").write_text("beta")
+    checkpoint_path = tmp_path / "ingest.ckpt"
+    checkpoint_path.write_text("a.txt\n")
+
+    checkpoint = Checkpoint(str(checkpoint_path))
+    progress = ingest(docs, vector_db, checkpoint)
+    checkpoint.close()
+
+    assert progress.skipped_files == 1
+    assert progress.files_done == 1
+    assert vector_db.points() == [("b.txt", point_id("b.txt", 0))]
+    assert checkpoint_path.read_text().splitlines() == ["a.txt", "b.txt"]
+
+    # A second run finds nothing left to do
+    rerun_db = make_vector_db()
+    checkpoint = Checkpoint(str(checkpoint_path))
+    progress = ingest(docs, rerun_db, checkpoint)
+    checkpoint.close()
+    assert progress.skipped_files == 2
+    assert rerun_db.upserts == []
+
+
+def test_file_spanning_several_batches_is_done_after_its_last_batch(
+    tmp_path, vector_db
+):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "long.txt").write_text("x" * 950)
+    (docs / "short.txt").write_text("y" * 10)
+
+    checkpoint = Checkpoint(None)
+    done_before_upsert = []
+    insert_many = vector_db.insert_many
+
+    def record_and_insert(*args, **kwargs):
+        done_before_upsert.append(set(checkpoint.done))
+        insert_many(*args, **kwargs)
+
+    vector_db.insert_many = record_and_insert
+    progress = ingest(
+        docs,
+        vector_db,
+        checkpoint,
+        batch_size=2,
+        embed_concurrency=1,
+        chunk_size=100,
+        chunk_overlap=0,
+    )
+
+    assert len(vector_db.upserts) == 6
+    assert all(len(texts) <= 2 for texts, _, _ in vector_db.upserts)
+    long_ids = [point for name, point in vector_db.points() if name == "long.txt"]
+    assert long_ids == [point_id("long.txt", i) for i in range(10)]
+    # long.txt fills the first five batches and is done only after the fifth
+    assert "long.txt" not in done_before_upsert[4]
+    assert "long.txt" in done_before_upsert[5]
+    assert checkpoint.done == {"long.txt", "short.txt"}
+    assert progress.chunks_done == 11
+
+
+def test_unparseable_file_is_recorded_and_does_not_stop_the_run(tmp_path, vector_db):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "broken.pdf").write_bytes(b"not a pdf")
+    write_pdf(docs / "good.pdf", ["Hello world"])
+    (docs / "notes.txt").write_text("notes")
+    checkpoint_path = tmp_path / "ingest.ckpt"
+
+    checkpoint = Checkpoint(str(checkpoint_path))
+    progress = ingest(docs, vector_db, checkpoint)
+    checkpoint.close()
+
+    assert progress.files_failed == 1
+    assert checkpoint.done == {"good.pdf", "notes.txt"}
+    assert list(checkpoint.failed) == ["broken.pdf"]
+    failed_lines = (tmp_path / "ingest.ckpt.failed").read_text().splitlines()
+    assert [line.split("\t")[0] for line in failed_lines] == ["broken.pdf"]
+    assert {name for name, _ in vector_db.points()} == {"good.pdf", "notes.txt"}
+
+
+def test_ingest_surfaces_storage_errors_unwrapped(tmp_path, vector_db):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.txt").write_text("alpha")
+
+    def fail(*args, **kwargs):
+        raise ConnectionError("qdrant unavailable")
+
+    vector_db.insert_many = fail
+
+    with pytest.raises(ConnectionError, match="qdrant unavailable"):
+        ingest(docs, vector_db, Checkpoint(None))
+
+
+def test_insert_many_upserts_one_batch_with_ids_and_file_names():
+    vector_db = VectorDatabase(collection_name="docs")
+    vector_db._client = FakeQdrantClient()
+    vector_db._collection_ready = True
+
+    vector_db.insert_many(
+        ["a", "b"], [[0.1], [0.2]], file_name=["x.txt", "y.txt"], ids=["1", "2"]
+    )
+    vector_db.insert_many(["c"], [[0.3]], file_name="z.pdf")
+    vector_db.insert_many([], [])
+
+    (first_name, first), (_, second) = vector_db._client.upserts
+    assert first_name == "docs"
+    assert [(p.id, p.vector, p.payload) for p in first] == [
+        ("1", [0.1], {"text": "a", "file_name": "x.txt"}),
+        ("2", [0.2], {"text": "b", "file_name": "y.txt"}),
+    ]
+    assert second[0].payload == {"text": "c", "file_name": "z.pdf"}
+    uuid.UUID(second[0].id)
+
+
+def test_loaders_iterate_directories_recursively_in_order(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "b.txt").write_text("bee")
+    (tmp_path / "a.txt").write_text("ay")
+    (tmp_path / "sub" / "c.txt").write_text("sea")
+    (tmp_path / "skip.md").write_text("ignored")
+    write_pdf(tmp_path / "sub" / "doc.PDF", ["Hello PDF"])
+
+    text_loader = TextFileLoader(str(tmp_path))
+    expected_txt = [
+        os.path.join(tmp_path, "a.txt"),
+        os.path.join(tmp_path, "b.txt"),
+        os.path.join(tmp_path, "sub", "c.txt"),
+    ]
+    assert list(text_loader.iter_paths()) == expected_txt
+    assert [text for _, text in text_loader.iter_directory()] == ["ay", "bee", "sea"]
+
+    pdf_loader = PDFLoader(str(tmp_path))
+    pdf_path = os.path.join(tmp_path, "sub", "doc.PDF")
+    assert list(pdf_loader.iter_paths()) == [pdf_path]
+    [(path, text)] = pdf_loader.iter_directory()
+    assert path == pdf_path
+    assert "Hello PDF" in text
@@ -0,0 +1,103 @@
+import asyncio
+import random
+
+import pytest
+from aimakerspace.pipeline import aingest_chunks, astore_chunks, point_id
+from aimakerspace.text_utils import CharacterTextSplitter
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_iter_split_matches_split_of_joined_text(seed):
+    rng = random.Random(seed)
+    pages = ["x" * rng.randint(0, 2500) + "\n" for _ in range(rng.randint(0, 8))]
+    splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+
+    assert list(splitter.iter_split(iter(pages))) == splitter.split("".join(pages))
+
+
+def test_aingest_chunks_batches_and_skips_blank_chunks(vector_db):
+    chunks = iter(["a", "  \n", "b", "c", "d", "e"])
+
+    stored = asyncio.run(
+        aingest_chunks(chunks, vector_db, file_name="doc.pdf", batch_size=2)
+    )
+
+    assert stored == 5
+    assert [texts for texts, _, _ in vector_db.upserts] == [
+        ["a", "b"],
+        ["c", "d"],
+        ["e"],
+    ]
+    assert {name for _, names, _ in vector_db.upserts for name in names} == {"doc.pdf"}
+    # Positions count the skipped blank chunk too, so they match the source
+    assert vector_db.ids() == [point_id("doc.pdf", i) for i in (0, 2, 3, 4, 5)]
+
+
+def test_aingest_chunks_retry_overwrites_the_same_points(vector_db):
+    insert_many = vector_db.insert_many
+
+    def fail_on_second_batch(*args, **kwargs):
+        if len(vector_db.upserts) == 1:
+            raise ConnectionError("qdrant unavailable")
+        insert_many(*args, **kwargs)
+
+    vector_db.insert_many = fail_on_second_batch
+    chunks = ["a", "b", "c", "d", "e"]
+    with pytest.raises(ConnectionError):
+        asyncio.run(
+            aingest_chunks(iter(chunks), vector_db, file_name="doc.pdf", batch_size=2)
+        )
+    partial_ids = vector_db.ids()
+
+    vector_db.insert_many = insert_many
+    asyncio.run(
+        aingest_chunks(iter(chunks), vector_db, file_name="doc.pdf", batch_size=2)
+    )
+
+    assert partial_ids == [point_id("doc.pdf", 0), point_id("doc.pdf", 1)]
+    assert set(vector_db.ids()) == {point_id("doc.pdf", i) for i in range(5)}
+
+
+def test_chunks_without_a_file_name_get_fresh_ids(vector_db):
+
+    for _ in range(2):
+        asyncio.run(aingest_chunks(iter(["a"]), vector_db))
+
+    assert len(set(vector_db.ids())) == 2
+    assert {name for _, names, _ in vector_db.upserts for name in names} == {""}
+
+
+def test_astore_chunks_reports_every_stored_batch(vector_db):
+    stored_batches = []
+
+    async def chunks():
+        for file_name in ("a.txt", "b.txt"):
+            for index in range(3):
+                yield file_name, index, f"{file_name} {index}"
+
+    stored = asyncio.run(
+        astore_chunks(
+            chunks(),
+            vector_db,
+            batch_size=4,
+            embed_concurrency=3,
+            on_stored=stored_batches.append,
+        )
+    )
+
+    assert stored == 6
+    assert sorted(len(batch) for batch in stored_batches) == [2, 4]
+    assert sorted(vector_db.ids()) == sorted(
+        point_id(name, i) for name in ("a.txt", "b.txt") for i in range(3)
+    )
+
+
+def test_aingest_chunks_surfaces_stage_errors(vector_db):
+
+    async def fail(texts):
+        raise RuntimeError("embedding failed")
+
+    vector_db.embedding_model.async_get_embeddings = fail
+
+    with pytest.raises(RuntimeError, match="embedding failed"):
+        asyncio.run(aingest_chunks(iter(["a"] * 10), vector_db, batch_size=2))
@@ -0,0 +1,186 @@
+import asyncio
+import threading
+
+import httpx
+import openai
+import pytest
+from aimakerspace.openai_utils.ratelimit import (
+    ConcurrencyTimeout,
+    RateLimitController,
+    RateLimitExceeded,
+    TokenBucket,
+    _rate_limiter,
+    get_rate_limiter,
+    parse_duration,
+)
+
+
+class RawResponse:
+    def __init__(self, value, headers=None):
+        self.value = value
+        self.headers = headers or {}
+
+    def parse(self):
+        return self.value
+
+
+def rate_limit_error(headers=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+    response = httpx.Response(429, headers=headers or {}, request=request)
+    return openai.RateLimitError("Rate limit reached", response=response, body=None)
+
+
+def test_parse_duration():
+    assert parse_duration("20ms") == pytest.approx(0.02)
+    assert parse_duration("6m0s") == pytest.approx(360)
+    assert parse_duration("1.5") == pytest.approx(1.5)
+    assert parse_duration(None) is None
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(per_minute=60)
+    bucket.take(60, now=0.0)
+    assert bucket.wait_time(1, now=0.0) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now=1.0) == 0.0
+
+
+def test_unconfigured_bucket_learns_limit_from_headers():
+    controller = RateLimitController(safety_factor=1.0)
+    controller.call(
+        lambda: RawResponse(
+            "ok",
+            {
+                "x-ratelimit-limit-requests": "100",
+                "x-ratelimit-remaining-requests": "5",
+            },
+        )
+    )
+    assert controller.requests.capacity == 100
+    assert controller.requests.level == pytest.approx(5, abs=0.1)
+
+
+def test_retries_throttled_calls_and_halves_concurrency():
+    controller = RateLimitController(initial_concurrency=8, base_delay=0.001)
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise rate_limit_error({"retry-after-ms": "1"})
+        return RawResponse("ok")
+
+    assert controller.call(fn) == "ok"
+    assert len(attempts) == 3
+    assert controller.stats["throttled"] == 2
+    # Both 429s arrive within a second, so concurrency is only halved once
+    assert 4 <= controller.concurrency < 5
+
+
+def test_gives_up_at_deadline():
+    controller = RateLimitController(base_delay=0.001)
+
+    async def fn():
+        raise rate_limit_error({"retry-after": "30"})
+
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        asyncio.run(controller.acall(fn, deadline=1.0))
+    assert excinfo.value.retry_after >= 30
+
+
+def test_non_retryable_errors_propagate():
+    controller = RateLimitController()
+
+    def fn():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        controller.call(fn)
+    assert controller._in_flight == 0
+
+
+def test_queued_calls_get_slots_in_arrival_order():
+    controller = RateLimitController(initial_concurrency=1, max_concurrency=1)
+    order = []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def call(name, gate=None):
+            async def fn():
+                order.append(name)
+                if gate:
+                    await gate.wait()
+                return RawResponse(name)
+
+            return await controller.acall(fn)
+
+        first = asyncio.create_task(call("first", release))
+        await asyncio.sleep(0)
+        queued = [asyncio.create_task(call(f"q{i}")) for i in range(3)]
+        await asyncio.sleep(0.01)
+        # Nothing is polling: the queued calls sleep until the slot is released
+        assert order == ["first"] and len(controller._waiters) == 3
+        release.set()
+        return await asyncio.gather(first, *queued)
+
+    assert asyncio.run(run()) == ["first", "q0", "q1", "q2"]
+    assert order == ["first", "q0", "q1", "q2"]
+    assert controller._in_flight == 0
+
+
+def test_sync_call_waits_for_a_released_slot():
+    controller = RateLimitController(initial_concurrency=1, max_concurrency=1)
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return RawResponse("slow")
+
+    thread = threading.Thread(target=controller.call, args=(slow,))
+    thread.start()
+    started.wait(5)
+    threading.Timer(0.05, release.set).start()
+    assert controller.call(lambda: RawResponse("next"), deadline=5) == "next"
+    thread.join(5)
+    assert controller._in_flight == 0
+
+
+def test_local_queue_timeout_is_not_reported_as_throttling():
+    controller = RateLimitController(initial_concurrency=1, max_concurrency=1)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold():
+            await release.wait()
+            return RawResponse("held")
+
+        held = asyncio.create_task(controller.acall(hold))
+        await asyncio.sleep(0)
+        with pytest.raises(ConcurrencyTimeout):
+            await controller.acall(hold, deadline=0.05)
+        assert not controller._waiters
+        release.set()
+        await held
+
+    asyncio.run(run())
+    with pytest.raises(ConcurrencyTimeout):
+        with controller._lock:
+            controller._in_flight = 1
+        controller.call(lambda: RawResponse("x"), deadline=0.05)
+    assert controller.stats["queue_timeouts"] == 2
+    assert controller.stats["throttled"] == 0
+
+
+def test_limiters_are_shared_per_key_and_model_in_a_bounded_cache():
+    limiter = get_rate_limiter("sk-test-a", "gpt-4.1-mini")
+
+    assert get_rate_limiter("sk-test-a", "gpt-4.1-mini") is limiter
+    assert get_rate_limiter("sk-test-a", "text-embedding-3-small") is not limiter
+    assert get_rate_limiter("sk-test-b", "gpt-4.1-mini") is not limiter
+
+    for i in range(_rate_limiter.cache_info().maxsize):
+        get_rate_limiter("sk-test-a", f"model-{i}")
+    # The least recently used controller was evicted
+    assert get_rate_limiter("sk-test-a", "gpt-4.1-mini") is not limiter
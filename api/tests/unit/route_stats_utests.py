@@ -0,0 +1,115 @@
+import pytest
+from aimakerspace.gpx_utils import Track, TrackSegment
+from aimakerspace.route_stats import (
+    RouteStatsStore,
+    format_route_stats,
+    summarize_tracks,
+)
+
+
+def route(file_name, distance_km, elevation_gain_m, point_count=10):
+    return {
+        "file_name": file_name,
+        "track_names": "Unnamed",
+        "track_count": 1,
+        "segment_count": 1,
+        "point_count": point_count,
+        "distance_km": distance_km,
+        "elevation_gain_m": elevation_gain_m,
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = RouteStatsStore(str(tmp_path / "route_stats.sqlite3"))
+    store.upsert(route("flat.gpx", 20.0, 50.0))
+    store.upsert(route("hilly.gpx", 12.0, 800.0))
+    store.upsert(route("short.gpx", 3.0, 120.0, point_count=2))
+    return store
+
+
+def test_upsert_replaces_rows_by_file_name(store):
+    store.upsert(route("flat.gpx", 21.5, 60.0))
+
+    assert store.get("flat.gpx")["distance_km"] == 21.5
+    assert store.get("missing.gpx") is None
+    assert set(store.get_many(["flat.gpx", "hilly.gpx", "missing.gpx"])) == {
+        "flat.gpx",
+        "hilly.gpx",
+    }
+
+
+def test_query_sorts_and_filters(store):
+    by_climb = store.query(sort_by="elevation_gain_m", descending=True)
+    assert [r["file_name"] for r in by_climb] == ["hilly.gpx", "short.gpx", "flat.gpx"]
+
+    longer = store.query(sort_by="distance_km", min_values={"distance_km": 10})
+    assert [r["file_name"] for r in longer] == ["hilly.gpx", "flat.gpx"]
+
+    capped = store.query(max_values={"elevation_gain_m": 200}, limit=1)
+    assert [r["file_name"] for r in capped] == ["flat.gpx"]
+
+
+def test_query_rejects_unknown_columns(store):
+    with pytest.raises(ValueError):
+        store.query(sort_by="file_name; DROP TABLE route_stats")
+    with pytest.raises(ValueError):
+        store.query(min_values={"track_names": 1})
+
+
+@pytest.fixture
+def trip_tracks():
+    first, second = TrackSegment(), TrackSegment()
+    first.append(42.0, -1.0, 100.0, float("nan"))
+    first.append(42.001, -1.001, 120.0, float("nan"))
+    second.append(42.01, -1.01, 110.0, float("nan"))
+    second.append(42.02, -0.99, 150.0, float("nan"))
+    return [Track("Day 1", [first]), Track(None, [TrackSegment(), second])]
+
+
+def test_summarize_tracks_aggregates_segments(trip_tracks):
+    pytest.importorskip("numpy")
+
+    stats = summarize_tracks("trip.gpx", trip_tracks)
+
+    assert stats["track_names"] == "Day 1, Unnamed"
+    assert stats["segment_count"] == 2
+    assert stats["point_count"] == 4
+    assert stats["elevation_gain_m"] == pytest.approx(60.0)
+    assert stats["distance_km"] > 0
+    assert (stats["start_lat"], stats["end_lon"]) == (42.0, -0.99)
+    assert (stats["min_lon"], stats["max_lat"]) == (-1.01, 42.02)
+    assert "Elevation gain: 60.0 m" in format_route_stats(stats)
+
+
+def test_summarize_tracks_keeps_per_track_breakdown(trip_tracks):
+    pytest.importorskip("numpy")
+
+    stats = summarize_tracks("trip.gpx", trip_tracks)
+
+    day_1, day_2 = stats["tracks"]
+    assert (day_1["track_index"], day_1["track_name"]) == (0, "Day 1")
+    assert (day_1["point_count"], day_1["elevation_gain_m"]) == (2, 20.0)
+    assert (day_2["segment_count"], day_2["start_lat"]) == (1, 42.01)
+    assert [s["point_count"] for s in day_2["segments"]] == [0, 2]
+    assert stats["distance_km"] == pytest.approx(
+        day_1["distance_km"] + day_2["distance_km"]
+    )
+
+
+def test_store_returns_tracks_and_replaces_them_on_upsert(tmp_path, trip_tracks):
+    pytest.importorskip("numpy")
+    store = RouteStatsStore(str(tmp_path / "route_stats.sqlite3"))
+    store.upsert(summarize_tracks("trip.gpx", trip_tracks))
+
+    stats = store.get("trip.gpx")
+    assert [t["track_name"] for t in stats["tracks"]] == ["Day 1", None]
+    text = format_route_stats(stats)
+    assert "Track 1 (Day 1): 1 segments, 2 points" in text
+    assert "Track 2 (Unnamed): 1 segments, 2 points" in text
+    assert "20.0 m gain" in text and "40.0 m gain" in text
+
+    store.upsert(summarize_tracks("trip.gpx", trip_tracks[:1]))
+    assert [t["track_name"] for t in store.get("trip.gpx")["tracks"]] == ["Day 1"]
+    # Sorting and filtering still work on the per-file totals
+    assert [r["track_count"] for r in store.query()] == [1]
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from aimakerspace.singleflight import SingleFlight
+
+
+def test_concurrent_identical_calls_share_one_upstream_call():
+    flights = SingleFlight()
+    upstream_calls = []
+
+    async def fetch(key):
+        upstream_calls.append(key)
+        await asyncio.sleep(0.01)
+        return [key]
+
+    async def main():
+        return await asyncio.gather(
+            *(flights.do("a", lambda: fetch("a")) for _ in range(5)),
+            flights.do("b", lambda: fetch("b")),
+        )
+
+    results = asyncio.run(main())
+    assert results == [["a"]] * 5 + [["b"]]
+    assert upstream_calls == ["a", "b"]
+    assert flights.stats == {"calls": 6, "shared": 4}
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    flights = SingleFlight()
+    attempts = []
+
+    async def fail():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def main():
+        results = await asyncio.gather(
+            flights.do("k", fail), flights.do("k", fail), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        with pytest.raises(RuntimeError):
+            await flights.do("k", fail)
+
+    asyncio.run(main())
+    assert len(attempts) == 2
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    flights = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flights.do("k", slow))
+        second = asyncio.ensure_future(flights.do("k", slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "done"